@@ -0,0 +1,214 @@
+# bench_render.py
+# Benchmark headless del render: carga los assets reales en un GraphicsManager
+# y ejecuta update()/draw() durante N frames en varios escenarios.
+# Escribe p50/p95/p99 del tiempo de frame y superficies creadas por frame en JSON.
+#
+# Uso:
+#   python core/bench_render.py --frames 600 --out bench.json
+#   python core/bench_render.py --full          # sin dirty rects (flip completo)
+#   python core/bench_render.py --backend compare   # surface vs texturas SDL2
+
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+from manager.graphics_manager import FALL_SPEED, RAYO_DURATION, GraphicsManager
+from manager.quality_manager import QUALITY_TIERS
+from manager.texture_renderer import TextureRenderer
+
+WIDTH, HEIGHT = 1207, 975
+DT = 1 / 60
+STORM_PER_FRAME = 24
+
+MATRIX = {
+    47: [0, 0.937, 1.875, 2.812],
+    56: [0, 0.937, 1.875, 2.812],
+    44: [0.468, 0.703, 1.406, 1.640, 2.343, 2.578, 3.281, 3.515],
+    0:  [round(i * 0.166, 3) for i in range(22)],
+}
+MESSAGES = (
+    'Du hast den Beat!',
+    'Kein Rythmus, keine Wolken!',
+    'Fühl den Beat, sei schneller.',
+    'Fühl den Beat, sei langsamer.',
+)
+
+
+# ---------------------------------------------------------------------
+# Escenarios: setup(g) una vez, step(g, frame, rng) antes de cada update/draw
+# ---------------------------------------------------------------------
+def _idle_step(g, frame, rng):
+    pass
+
+
+def _storm_step(g, frame, rng):
+    idx = g.particles.image_index(g.rayo_img if frame % 2 else g.nota_img)
+    xs = rng.uniform(0, WIDTH, STORM_PER_FRAME)
+    g.particles.emit(idx, xs, rng.uniform(0, HEIGHT // 2), RAYO_DURATION * 2, vy=FALL_SPEED)
+    if frame % 6 == 0:
+        g.on_crush()
+        g.on_crush_midi()
+
+
+def _messages_step(g, frame, rng):
+    if frame % 30 == 0:
+        g.set_msg(MESSAGES[(frame // 30) % len(MESSAGES)])
+    if frame % 45 == 0:
+        g.tick()
+
+
+def _end_setup(g):
+    g.patterns_completed[:] = [True, True, True]
+    g.cloudia = None
+    g.set_msg('Du hast den Bann gebrochen.')
+    g.set_end_status()
+
+
+def _clouds_step(g, frame, rng):
+    if frame % 20 == 0:
+        nube = (frame // 20) % 3
+        g.set_nube_buena(nube)
+        g.update_bg()
+        g._place_clouds(g.cloud_imgs, g.cloud_imgs_sel, g.width)
+        g._apply_selection((nube + 1) % 3)
+
+
+SCENARIOS = {
+    "idle": (None, _idle_step),
+    "storm": (None, _storm_step),
+    "messages": (None, _messages_step),
+    "end": (_end_setup, _idle_step),
+    "clouds": (None, _clouds_step),
+}
+
+
+def _percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "max_ms": round(float(np.max(samples_ms)), 3),
+            "mean_ms": round(float(np.mean(samples_ms)), 3)}
+
+
+BACKENDS = ("surface", "sdl2")
+
+
+def run_scenario(screen, name, frames, dirty_rects=True, tier=0, warmup=10, renderer=None):
+    """renderer: TextureRenderer para medir el backend sdl2 (None → blits sobre `screen`)."""
+    setup, step = SCENARIOS[name]
+    g = GraphicsManager(dirty_rects=dirty_rects)
+    with contextlib.redirect_stdout(sys.stderr):
+        g.load_assets(screen, messages=MESSAGES + ('Du hast den Bann gebrochen.',),
+                      prescale=renderer is None)
+    g.set_quality(QUALITY_TIERS[tier])
+    g.set_timeline_from_matrix(MATRIX)
+    if setup:
+        setup(g)
+    if renderer:
+        renderer.set_scale(QUALITY_TIERS[tier].scale)
+        renderer.upload(g.resident_surfaces())
+    rng = np.random.default_rng(0)
+
+    times = np.empty(frames)
+    allocs = np.empty(frames, dtype=np.int64)
+    blits = np.empty(frames, dtype=np.int64)
+    uploads = np.zeros(frames, dtype=np.int64)
+    for frame in range(-warmup, frames):
+        t0 = time.perf_counter()
+        step(g, frame, rng)
+        g.update(DT)
+        if renderer:
+            renderer.draw(g.scene())
+            renderer.present()
+        else:
+            rects = g.draw()
+            if rects is None:
+                pygame.display.flip()
+            elif rects:
+                pygame.display.update(rects)
+        if frame >= 0:
+            times[frame] = (time.perf_counter() - t0) * 1000
+            allocs[frame] = g.frame_allocs
+            blits[frame] = g.frame_blits
+            if renderer:
+                uploads[frame] = renderer.frame_uploads
+
+    result = _percentiles(times)
+    result.update({
+        "frames": frames,
+        "surfaces_per_frame": round(float(allocs.mean()), 4),
+        "surfaces_total": int(allocs.sum()),
+        "blits_per_frame": round(float(blits.mean()), 2),
+        "particles_dropped": int(g.particles.dropped),
+    })
+    if renderer:
+        result["uploads_per_frame"] = round(float(uploads.mean()), 4)
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark headless de GraphicsManager")
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                    help="escenario a ejecutar (repetible); por defecto todos")
+    ap.add_argument("--full", action="store_true", help="redibujado completo en vez de dirty rects")
+    ap.add_argument("--tier", type=int, default=0, choices=range(len(QUALITY_TIERS)),
+                    help="nivel de calidad fijo (0 = máxima)")
+    ap.add_argument("--backend", choices=BACKENDS + ("compare",), default="surface",
+                    help="backend de render; compare mide ambos")
+    ap.add_argument("--out", help="fichero JSON de salida (por defecto stdout)")
+    args = ap.parse_args(argv)
+
+    backends = BACKENDS if args.backend == "compare" else (args.backend,)
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    renderer = None
+    if "sdl2" in backends:
+        with contextlib.redirect_stdout(sys.stderr):
+            renderer = TextureRenderer("bench", (WIDTH, HEIGHT))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())),
+            "video_driver": pygame.display.get_driver(),
+            "machine": platform.machine(),
+            "dirty_rects": not args.full,
+            "quality_tier": args.tier,
+            "size": [WIDTH, HEIGHT],
+            "backends": list(backends),
+            "sdl2_software": renderer.software if renderer else None,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario or SCENARIOS:
+        for backend in backends:
+            result = run_scenario(screen, name, args.frames, dirty_rects=not args.full, tier=args.tier,
+                                  renderer=renderer if backend == "sdl2" else None)
+            # Con un solo backend se mantiene el formato plano {escenario: resultado}
+            key = name if len(backends) == 1 else f"{name}/{backend}"
+            report["scenarios"][key] = result
+            print(f"[Bench] {key}: p50 {result['p50_ms']} ms", file=sys.stderr)
+
+    pygame.quit()
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,10 @@ except Exception:
     _MIDI_AVAILABLE = False
     midi = None  # type: ignore
 
+from manager.note_scheduler import NoteScheduler
+
+CLICK_LENGTH = 0.05  # seg del click guía
+
 # Tu propio módulo gráfico según tu proyecto:
 # from manager.graphics_manager import spawn_enemy, spawn_note, show_hit_note
 # Aquí definimos stubs para que el archivo sea ejecutable aislado:
@@ -53,13 +57,13 @@ class MidiOut:
             except Exception:
                 self.out = None
 
-    def note_on(self, note: int):
+    def note_on(self, note: int, velocity: Optional[int] = None, channel: int = 0):
         if self.out:
-            self.out.note_on(note, self.velocity)
+            self.out.note_on(note, self.velocity if velocity is None else velocity, channel)
 
-    def note_off(self, note: int):
+    def note_off(self, note: int, velocity: Optional[int] = None, channel: int = 0):
         if self.out:
-            self.out.note_off(note, self.velocity)
+            self.out.note_off(note, self.velocity if velocity is None else velocity, channel)
 
     def close(self):
         if self.out:
@@ -101,6 +105,8 @@ class GameLoop:
         self.loop_idx = 0
         self.step_idx = 0
         self.midi = MidiOut(instrument=midi_instrument, velocity=midi_velocity)
+        # tick() no debe bloquear: los note_off los manda el hilo del scheduler
+        self.notes = NoteScheduler(self.midi).start()
         self.lightning_alpha = lightning_alpha
 
     # Debe ser llamado por tu sistema de input cuando el jugador presiona el botón
@@ -109,16 +115,12 @@ class GameLoop:
 
     def _send_midi_click(self, cloud_idx: int, step_idx: int):
         pitch = self.pitch_mapper(cloud_idx, step_idx)
-        self.midi.note_on(pitch)
         # click corto
-        time.sleep(0.05)
-        self.midi.note_off(pitch)
+        self.notes.play(pitch, self.midi.velocity, CLICK_LENGTH)
 
     def _send_midi_note(self, cloud_idx: int, step_idx: int, sustain: float = 0.35):
         pitch = self.pitch_mapper(cloud_idx, step_idx)
-        self.midi.note_on(pitch)
-        time.sleep(sustain)
-        self.midi.note_off(pitch)
+        self.notes.play(pitch, self.midi.velocity, sustain)
 
     def _loop_end(self):
         # Evaluar loop para la nube activa
@@ -148,9 +150,7 @@ class GameLoop:
         cloud = self.rm.current_cloud
         is_mastered = self.rm.progress[cloud].mastered
 
-        expected_steps = set(self.rm.expected_steps_for_cloud(cloud))
-
-        if self.step_idx in expected_steps:
+        if self.rm.is_expected_step(cloud, self.step_idx):
             if is_mastered:
                 # En modo notas: no se generan enemigos; se dispara nota visual/sonora
                 spawn_note(cloud, self.step_idx, sustain_seconds=0.5)
@@ -166,6 +166,7 @@ class GameLoop:
             self._loop_end()
 
     def shutdown(self):
+        self.notes.stop()
         self.midi.close()
 
 
@@ -1,86 +1,184 @@
+import os
 import time
+import numpy as np
 import pygame
 import pygame.midi
+from manager.frame_profiler import OVERLAY_POS, FrameProfiler
 from manager.graphics_manager import GraphicsManager
 from manager.loop_manager import LoopManager
+from manager.midi_input import MidiInputThread
 from manager.midi_manager import MIDIManager
+from manager.note_scheduler import NoteScheduler
+from manager.quality_manager import QualityGovernor
+from manager.tempo_tracker import PatternBank, TempoTracker
+from manager.texture_renderer import TextureRenderer
+from manager.virtual_midi import VirtualInput, VirtualOutput, hit_latencies
 
 CHANNEL = 9
 VEL = 110
 INSTRUMENTS = [47, 56, 44, 0]
-PERIOD = 3.75
+BPM = 64            # tempo hasta que llegue el reloj MIDI (4 tiempos = 3.75 s); luego manda el DUO
+BEATS_PER_LOOP = 4
+OUTPUT_LATENCY_MS = 10  # latency de midi_out: los timestamps del secuenciador solo cuentan con > 0
+# Los golpes en vivo van por otro puerto (live_out, latency 0): con latency > 0 PortMidi
+# exige timestamps no decrecientes por stream, y write_short marca "ahora" detrás de
+# lo que el secuenciador ya programó por adelantado
+CLICK_LENGTH = 0.05  # seg de nota al golpear (note_off diferido, sin bloquear)
+ROTATION_INVARIANT = True  # el patrón cuenta aunque se empiece en otro de sus golpes
+DIRTY_RECTS = True  # False → redibujado completo + flip() en cada frame
+ASSET_CACHE = True  # False → decodificar siempre los PNG (sin assets/images/.cache)
+PROFILE = False     # medir etapas desde el inicio (F3 overlay, F4 volcado a JSON)
+STAGES = ("midi_in", "loop", "midi_out", "update", "draw", "present")
 
+# Simulación a paso fijo, independiente del ritmo de render
+SIM_HZ = 240
+SIM_DT = 1.0 / SIM_HZ
+MAX_SIM_STEPS = SIM_HZ // 10  # como mucho 0.1 s de simulación por frame
+RENDER_FPS = 60               # 0 → sin límite
+ADAPTIVE_QUALITY = True       # bajar/subir calidad según el tiempo de frame
+# Sin hardware: guion de eventos (ver manager/virtual_midi) y JSON donde guardar la salida
+VIRTUAL_MIDI = os.environ.get("UBT_VIRTUAL_MIDI")
+VIRTUAL_MIDI_LOG = os.environ.get("UBT_VIRTUAL_MIDI_LOG")
+RENDER_BACKEND = "surface"    # "surface" (blits + dirty rects) | "sdl2" (texturas, pygame._sdl2)
+
+# Mensajes fijos que se muestran con graphics.set_msg (se pre-renderizan al cargar)
+MESSAGES = (
+    'Du hast den Beat!',
+    'Du beherschst den Tanz der Wolken!',
+    'Du hast den Bann gebrochen.',
+    'Kein Rythmus, keine Wolken!',
+    'Ohne Beat darfst du keine Melodie spielen!',
+    'Fühl den Beat, sei schneller.',
+    'Fühl den Beat, sei langsamer.',
+)
+
+t_start = time.perf_counter()
 pygame.init()
 pygame.midi.init()
 clock = pygame.time.Clock()
 
 WIDTH, HEIGHT = 1207, 975
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("☁️ Umpa Bumpa Trommel ☁️")
+TITLE = "☁️ Umpa Bumpa Trommel ☁️"
+renderer = None
+if RENDER_BACKEND == "sdl2":
+    # El display queda oculto (solo hace falta para convert()); se ve la ventana del renderer
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HIDDEN)
+    renderer = TextureRenderer(TITLE, (WIDTH, HEIGHT))
+else:
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(TITLE)
 
-graphics = GraphicsManager()
-graphics.load_assets(screen)
+graphics = GraphicsManager(dirty_rects=DIRTY_RECTS, asset_cache=ASSET_CACHE)
+graphics.load_assets(screen, messages=MESSAGES, prescale=renderer is None)
+if renderer:
+    renderer.upload(graphics.resident_surfaces())
+    renderer.draw(graphics.scene())
+    renderer.present()
+else:
+    graphics.draw()
+    pygame.display.flip()
+print(f"[Main] Primer frame en {(time.perf_counter() - t_start) * 1000:.0f} ms "
+      f"(cache de assets {'activada' if ASSET_CACHE else 'desactivada'})")
 
-matrix = {
-    47: [0, 0.937, 1.875, 2.812],
-    56: [0, 0.937, 1.875, 2.812],
-    44: [0.468, 0.703, 1.406, 1.640, 2.343, 2.578, 3.281, 3.515],
-    0:  [0.   , 0.166, 0.332, 0.498, 0.664, 0.83 , 0.996, 1.162, 1.328,
-       1.494, 1.66 , 1.826, 1.992, 2.158, 2.324, 2.49 , 2.656, 2.822,
-       2.988, 3.154, 3.32 , 3.486]
-}
+# Patrones en tiempos (negras) dentro del loop; se compilan a segundos según el tempo
+patterns = PatternBank({
+    47: [0, 1, 2, 3],
+    56: [0, 1, 2, 3],
+    44: [0.5, 0.75, 1.5, 1.75, 2.5, 2.75, 3.5, 3.75],
+    0:  [round(i * 0.166 * BPM / 60, 4) for i in range(22)],  # pasos de 0.166 s a 64 BPM
+}, BEATS_PER_LOOP)
+tempo = TempoTracker(BPM, BEATS_PER_LOOP)
 
-# 
-loop_manager = LoopManager(matrix[INSTRUMENTS[0]], PERIOD)
 
+def expected_for(cloud_idx):
+    """Onsets en segundos del patrón de la nube al tempo actual (compilación cacheada)."""
+    return patterns.compile(tempo.bpm)[INSTRUMENTS[cloud_idx]]
 
-graphics.set_timeline_from_matrix(matrix)
 
-print("\n=== Dispositivos MIDI ===")
-for i in range(pygame.midi.get_count()):
-    interf, name, inp, outp, opened = pygame.midi.get_device_info(i)
-    print(f"[{i}] {name.decode()} {'(IN)' if inp else '(OUT)' if outp else ''}")
+loop_manager = LoopManager(expected_for(0), tempo.loop_seconds, tempo=tempo, rotation=ROTATION_INVARIANT)
 
-input_id = int(input("\nSelecciona ID de entrada (DATO DUO): "))
-output_id = int(input("Selecciona ID de salida (Microsoft GS Wavetable Synth): "))
+graphics.set_tempo(tempo)
+graphics.set_timeline_from_matrix(patterns.beats)
 
-midi_in = pygame.midi.Input(input_id)
-midi_out = pygame.midi.Output(output_id)
+if VIRTUAL_MIDI:
+    print(f"[MIDI] Dispositivos virtuales, guion {VIRTUAL_MIDI}")
+    midi_in = VirtualInput.from_file(VIRTUAL_MIDI)
+    midi_out = VirtualOutput(latency=OUTPUT_LATENCY_MS)
+    live_out = VirtualOutput(latency=0, messages=midi_out.messages)
+    seq_latency = OUTPUT_LATENCY_MS
+else:
+    print("\n=== Dispositivos MIDI ===")
+    for i in range(pygame.midi.get_count()):
+        interf, name, inp, outp, opened = pygame.midi.get_device_info(i)
+        print(f"[{i}] {name.decode()} {'(IN)' if inp else '(OUT)' if outp else ''}")
 
-midi_manager = MIDIManager(graphics.patterns_completed, matrix, midi_out, vel=VEL, channel=CHANNEL)
+    input_id = int(input("\nSelecciona ID de entrada (DATO DUO): "))
+    output_id = int(input("Selecciona ID de salida (Microsoft GS Wavetable Synth): "))
+
+    midi_in = pygame.midi.Input(input_id)
+    midi_out = pygame.midi.Output(output_id, latency=OUTPUT_LATENCY_MS)
+    seq_latency = OUTPUT_LATENCY_MS
+    try:
+        live_out = pygame.midi.Output(output_id, latency=0)
+    except Exception as e:  # _pypm.Output lanza Exception a secas (texto de Pm_GetErrorText)
+        # El dispositivo no admite dos puertos: uno solo sin latency (escrituras inmediatas,
+        # siempre en orden). La latency no se cambia en un puerto abierto: se cierra y se reabre
+        print(f"[MIDI] Sin segundo puerto de salida ({e}); secuenciador sin lookahead")
+        midi_out.close()
+        midi_out = live_out = pygame.midi.Output(output_id, latency=0)
+        seq_latency = 0
+# Desde aquí midi_in solo se lee en su hilo; clock/transporte llegan por drain_realtime()
+midi_capture = MidiInputThread(midi_in, route_realtime=True).start()
+notes = NoteScheduler(live_out)  # puede ser el mismo puerto que MIDIManager: note_offs desde el frame loop
+
+midi_manager = MIDIManager(graphics.patterns_completed, patterns.beats, midi_out, vel=VEL, channel=CHANNEL,
+                           latency_ms=seq_latency, tempo=tempo, clock=midi_capture.clock)
 midi_manager.set_graphics(graphics)
 
+profiler = FrameProfiler(STAGES, enabled=PROFILE)
+governor = QualityGovernor(target_fps=RENDER_FPS or 60) if ADAPTIVE_QUALITY else None
+
 running = True
 last_time = time.time()
+sim_time = last_time  # instante del último paso simulado (sim_time + accumulator == now)
+accumulator = 0.0
 fret = 0
 result = None
+tempo_version = tempo.version
 
 while running:
+    clock.tick(RENDER_FPS)
+    frame_start = time.perf_counter()
     now = time.time()
-    dt = now - last_time
+    accumulator += now - last_time
     last_time = now
-    clock.tick(60)
 
     for event in pygame.event.get():
-        if event.type == pygame.QUIT:
+        if event.type in (pygame.QUIT, pygame.WINDOWCLOSE):
             running = False
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            if profiler.overlay_rect:
+                graphics.mark_dirty(profiler.overlay_rect)
+            profiler.toggle_overlay()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            profiler.dump(f"profile_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    if VIRTUAL_MIDI and midi_in.finished:
+        running = False
 
-    if midi_in and midi_in.poll():
-        events = midi_in.read(20)
-        for data, ts in events:
-            status, cc, value, _ = data
+    with profiler.stage("midi_in"):
+        for t, status, _, _ in midi_capture.drain_realtime():
+            tempo.feed(t, status)
+            if status == 0xFB and all(graphics.patterns_completed):  # Continue
+                loop_manager.set_melodie_mode()
+                loop_manager.set_expected(expected_for(graphics.selected_cloud_index))
+        for t, status, cc, value in midi_capture.drain():
             if (status & 0xF0) == 0xB0:
                 if cc == 81 and value >= 64:  # Crush
                     graphics.on_crush()
                     idx = graphics.selected_cloud_index
                     note = INSTRUMENTS[idx % len(INSTRUMENTS)]
-                    loop_manager.register_input()
-                    midi_out.note_on(note, VEL, CHANNEL)
-                    time.sleep(0.05)
-                    midi_out.note_off(note, 0, CHANNEL)
-            if status == 251 and all(graphics.patterns_completed):
-                loop_manager.set_melodie_mode()
-                loop_manager.set_expected(matrix[INSTRUMENTS[graphics.selected_cloud_index]])
+                    loop_manager.register_input(t=t)
+                    notes.play(note, VEL, CLICK_LENGTH, CHANNEL)
             if cc == 63:
                 if all(graphics.patterns_completed): 
                     fret = fret + 1
@@ -91,55 +189,110 @@ while running:
                     graphics.set_msg('Ohne Beat darfst du keine Melodie spielen!', error=True)
             if cc in [49,51,63] and value == 100 and all(graphics.patterns_completed):
                 #print(data)
-                loop_manager.register_input(cc)
+                loop_manager.register_input(cc, t=t)
                 #elif cc == 71:  # Resonancia → selección nube
                 #    graphics.on_resonance(value)
-    result = loop_manager.update()
-    if result is not None:
-        print(result)
-    if result == 'progress':
-        graphics.anim_img = graphics.nota_img
-    elif result == 'trampa':
-        graphics.set_msg('Kein Rythmus, keine Wolken!') 
-    elif result == 'next':
-        if not all(graphics.patterns_completed):
-            graphics.patterns_completed[graphics.selected_cloud_index] = True
-            graphics.set_nube_buena(graphics.selected_cloud_index)
-            graphics.update_bg()
-            midi_manager.patterns_completed = graphics.patterns_completed
-            #graphics.selected_cloud_index = graphics.selected_cloud_index + 1
-            #if not all(graphics.patterns_completed):
-            graphics.next_nube()
-            graphics.nerv_cloudia()
-            graphics._place_clouds(graphics.cloud_imgs, graphics.cloud_imgs_sel, graphics.width)
-            graphics._apply_selection(graphics.selected_cloud_index)
-            loop_manager.set_expected(matrix[INSTRUMENTS[graphics.selected_cloud_index]])
-            graphics.set_msg('Du hast den Beat!')
-            loop_manager.user_inputs = []
-        else: 
-            graphics.set_msg('Du beherschst den Tanz der Wolken!')
-    elif result == 'reset':
-        midi_manager.reset()
-        graphics.tick()
-        if not all(graphics.patterns_completed):
-            graphics.anim_img = graphics.rayo_img
-        else:
-            graphics.on_crush()
-    elif result == 'lento':
-        graphics.set_msg('Fühl den Beat, sei schneller.')
-    elif result == 'rapido':
-        graphics.set_msg('Fühl den Beat, sei langsamer.')
-    elif result == 'end':
-        graphics.cloudia = None
-        graphics.set_msg('Du hast den Bann gebrochen.')
-        graphics.set_end_status()
+    with profiler.stage("loop"):
+        result = loop_manager.update()
+        if result is not None:
+            print(result)
+        if result == 'progress':
+            graphics.anim_img = graphics.nota_img
+        elif result == 'trampa':
+            graphics.set_msg('Kein Rythmus, keine Wolken!') 
+        elif result == 'next':
+            if not all(graphics.patterns_completed):
+                graphics.patterns_completed[graphics.selected_cloud_index] = True
+                graphics.set_nube_buena(graphics.selected_cloud_index)
+                graphics.update_bg()
+                midi_manager.patterns_completed = graphics.patterns_completed
+                #graphics.selected_cloud_index = graphics.selected_cloud_index + 1
+                #if not all(graphics.patterns_completed):
+                graphics.next_nube()
+                graphics.nerv_cloudia()
+                graphics._place_clouds(graphics.cloud_imgs, graphics.cloud_imgs_sel, graphics.width)
+                graphics._apply_selection(graphics.selected_cloud_index)
+                loop_manager.set_expected(expected_for(graphics.selected_cloud_index))
+                graphics.set_msg('Du hast den Beat!')
+                loop_manager.clear_inputs()
+            else: 
+                graphics.set_msg('Du beherschst den Tanz der Wolken!')
+        elif result == 'reset':
+            midi_manager.reset()
+            if tempo.version != tempo_version:  # el DUO cambió de tempo: patrón a segundos otra vez
+                tempo_version = tempo.version
+                loop_manager.set_expected(expected_for(graphics.selected_cloud_index))
+            graphics.tick()
+            if not all(graphics.patterns_completed):
+                graphics.anim_img = graphics.rayo_img
+            else:
+                graphics.on_crush()
+        elif result == 'lento':
+            graphics.set_msg('Fühl den Beat, sei schneller.')
+        elif result == 'rapido':
+            graphics.set_msg('Fühl den Beat, sei langsamer.')
+        elif result == 'end':
+            graphics.cloudia = None
+            graphics.set_msg('Du hast den Bann gebrochen.')
+            graphics.set_end_status()
     
-    midi_manager.update()
-    graphics.update(dt)
-    graphics.draw()
-    pygame.display.flip()
+    with profiler.stage("midi_out"):
+        midi_manager.update()
+        notes.service()
+    with profiler.stage("update"):
+        steps = 0
+        while accumulator >= SIM_DT:
+            if steps == MAX_SIM_STEPS:
+                # Espiral de la muerte: descartar el atraso y re-sincronizar con el reloj
+                accumulator %= SIM_DT
+                sim_time = now - accumulator
+                break
+            sim_time += SIM_DT
+            accumulator -= SIM_DT
+            graphics.update(SIM_DT, now=sim_time)
+            steps += 1
+    with profiler.stage("draw"):
+        if renderer:
+            scene = graphics.scene(alpha=accumulator / SIM_DT)
+            overlay = profiler.overlay_surface()
+            if overlay:
+                scene.append((overlay, OVERLAY_POS))
+            renderer.draw(scene)
+        else:
+            rects = graphics.draw(alpha=accumulator / SIM_DT)
+            overlay = profiler.draw_overlay(screen)
+            if overlay:
+                graphics.mark_dirty(overlay)
+                if rects is not None:
+                    rects.append(overlay)
+    with profiler.stage("present"):
+        if renderer:
+            renderer.present()
+        elif rects is None:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+    profiler.end_frame()
+    if governor:
+        tier = governor.observe((time.perf_counter() - frame_start) * 1000)
+        if tier:
+            graphics.set_quality(tier)
+            if renderer:
+                renderer.set_scale(tier.scale)
 
+midi_capture.stop()
+print(f"[MIDI] {midi_capture.stats}")
+notes.flush()
+if VIRTUAL_MIDI:
+    lat = hit_latencies(midi_in, midi_out) * 1000
+    if len(lat):
+        print(f"[MIDI] golpe → nota: {len(lat)} golpes, p50 {np.nanpercentile(lat, 50):.1f} ms, "
+              f"máx {np.nanmax(lat):.1f} ms, sin respuesta {int(np.isnan(lat).sum())}")
+    if VIRTUAL_MIDI_LOG:
+        midi_out.dump(VIRTUAL_MIDI_LOG, origin=midi_in.start_time or 0.0)
 del midi_in
+if live_out is not midi_out:
+    live_out.close()
 midi_out.close()
 pygame.midi.quit()
 pygame.quit()
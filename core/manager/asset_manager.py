@@ -0,0 +1,227 @@
+# asset_manager.py
+# Carga de imágenes, variantes pre-generadas y atlas de sprites.
+# - Los fondos opacos usan convert() (sin canal alfa → blit más barato)
+# - Los overlays de pantalla completa con alfa quedan fuera del atlas
+# - Los sprites y sus variantes (nubes buenas/malas, selección tintada,
+#   CloudIA volteada) se generan al cargar y se empaquetan en atlas
+# - Todo lo que tiene alfa por pixel usa RLEACCEL
+# Así, durante la partida nunca se lee ni decodifica nada de disco.
+#
+# Los PNG se decodifican en paralelo (pool de hilos). Los pixeles decodificados
+# se guardan en assets/images/.cache (clave: nombre + mtime + tamaño del PNG); en los
+# siguientes arranques se mapean con mmap y se pasan a pygame.image.frombuffer
+# sin volver a pasar por el decodificador PNG.
+
+from __future__ import annotations
+import mmap
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+import pygame
+
+ATLAS_SIZE = 2048
+ATLAS_PADDING = 2
+SEL_TINT = ((120, 200, 255), 20)
+
+CACHE_DIR_NAME = ".cache"
+CACHE_MAGIC = b"UBPX"
+CACHE_HEADER = struct.Struct("<4sII")  # magic, ancho, alto; luego pixeles RGBA
+
+# Imágenes que usa el juego, agrupadas por tratamiento
+OPAQUE_IMAGES = ("background1.png", "background15.png", "background16.png", "background17.png")
+OVERLAY_IMAGES = ("background2.png", "hint.png")
+SPRITE_IMAGES = (
+    "malo.png", "nota.png", "msg.png", "cloudia.png",
+    "cloud1.png", "cloud2.png", "cloud3.png",
+    "cloud1a.png", "cloud2a.png", "cloud3a.png",
+    "tambor_g.png", "tambor_gs.png", "tambor_p_player.png", "tambor_p_player2.png",
+)
+
+
+class PixelCache:
+    """Pixeles RGBA ya decodificados, un fichero por imagen y versión del PNG."""
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, png: Path) -> Path:
+        st = png.stat()
+        return self.directory / f"{png.stem}-{st.st_mtime_ns}-{st.st_size}.rgba"
+
+    def get(self, png: Path):
+        """Devuelve (mmap, tamaño) o None si no hay entrada válida."""
+        entry = self._entry(png)
+        try:
+            with open(entry, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        magic, w, h = CACHE_HEADER.unpack_from(mm)
+        if magic != CACHE_MAGIC or len(mm) != CACHE_HEADER.size + w * h * 4:
+            mm.close()
+            self.misses += 1
+            return None
+        self.hits += 1
+        return mm, (w, h)
+
+    def put(self, png: Path, surf: pygame.Surface) -> None:
+        entry = self._entry(png)
+        try:
+            self.directory.mkdir(exist_ok=True)
+            for old in self.directory.glob(f"{png.stem}-*.rgba"):
+                old.unlink()
+            tmp = entry.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(CACHE_HEADER.pack(CACHE_MAGIC, *surf.get_size()))
+                f.write(pygame.image.tobytes(surf, "RGBA"))
+            tmp.replace(entry)
+        except OSError as e:
+            print(f"[Assets] No se pudo escribir la cache de {png.name}: {e}")
+
+
+def _decode(full: Path, cache: PixelCache | None):
+    """Corre en el pool: devuelve una Surface sin convertir o (mmap, tamaño) de la cache."""
+    if not full.exists():
+        raise FileNotFoundError(f"[Graphics] Falta asset: {full}")
+    if cache is not None:
+        cached = cache.get(full)
+        if cached is not None:
+            return cached
+    img = pygame.image.load(str(full))
+    if cache is not None:
+        cache.put(full, img)
+    return img
+
+
+def _finish(decoded, opaque: bool) -> pygame.Surface:
+    """Hilo principal: convierte al formato de la pantalla (copia) y libera el mmap."""
+    if isinstance(decoded, pygame.Surface):
+        return decoded.convert() if opaque else decoded.convert_alpha()
+    mm, size = decoded
+    pixels = memoryview(mm)[CACHE_HEADER.size:]
+    raw = pygame.image.frombuffer(pixels, size, "RGBA")
+    img = raw.convert() if opaque else raw.convert_alpha()
+    del raw
+    pixels.release()
+    mm.close()
+    return img
+
+
+def _tint(surf: pygame.Surface, tint_color=(120, 180, 255), strength=80) -> pygame.Surface:
+    copy = surf.copy()
+    overlay = pygame.Surface(copy.get_size(), pygame.SRCALPHA)
+    overlay.fill((*tint_color, strength))
+    copy.blit(overlay, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+    return copy
+
+
+def _surface_bytes(surf: pygame.Surface) -> int:
+    return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+
+def bake_variants(sprites: Dict[str, pygame.Surface]) -> None:
+    """Añade al dict las variantes que el juego necesita (en el sitio)."""
+    for i in range(1, 4):
+        for name in (f"cloud{i}", f"cloud{i}a"):
+            sprites[f"{name}_sel"] = _tint(sprites[name], *SEL_TINT)
+    sprites["cloudia_flip"] = pygame.transform.flip(sprites["cloudia"], True, False)
+
+
+def pack_atlas(sprites: Dict[str, pygame.Surface], size: int = ATLAS_SIZE,
+               padding: int = ATLAS_PADDING) -> Tuple[List[pygame.Surface], Dict[str, pygame.Surface]]:
+    """
+    Empaqueta sprites en páginas de hasta size x size (estantes ordenados por altura).
+    Cada página se recorta al área usada.
+    Devuelve (páginas, {nombre: subsurface de su página}).
+    """
+    order = sorted(sprites, key=lambda n: (sprites[n].get_height(), sprites[n].get_width()), reverse=True)
+    placed: List[List[Tuple[str, int, int]]] = []
+    x = y = shelf_h = 0
+    for name in order:
+        w, h = sprites[name].get_size()
+        if w > size or h > size:
+            raise ValueError(f"[Assets] {name} ({w}x{h}) no cabe en un atlas de {size}x{size}")
+        if placed and x + w > size:
+            x, y, shelf_h = 0, y + shelf_h + padding, 0
+        if not placed or y + h > size:
+            placed.append([])
+            x = y = shelf_h = 0
+        placed[-1].append((name, x, y))
+        x += w + padding
+        shelf_h = max(shelf_h, h)
+
+    pages: List[pygame.Surface] = []
+    regions: Dict[str, pygame.Surface] = {}
+    for entries in placed:
+        pw = max(px + sprites[n].get_width() for n, px, _ in entries)
+        ph = max(py + sprites[n].get_height() for n, _, py in entries)
+        page = pygame.Surface((pw, ph), pygame.SRCALPHA).convert_alpha()
+        page.fill((0, 0, 0, 0))
+        for name, px, py in entries:
+            page.blit(sprites[name], (px, py))
+            regions[name] = page.subsurface((px, py) + sprites[name].get_size())
+        pages.append(page)
+    return pages, regions
+
+
+class AssetManager:
+    """Carga todas las imágenes del juego una sola vez, al inicio."""
+    def __init__(self, base: Path, use_cache: bool = True, workers: int | None = None):
+        """
+        base      : carpeta assets/images
+        use_cache : usar/escribir la cache de pixeles decodificados
+        workers   : hilos de decodificación (None → según CPUs)
+        """
+        self.base = base
+        self.cache = PixelCache(base / CACHE_DIR_NAME) if use_cache else None
+        self.workers = workers
+        self.images: Dict[str, pygame.Surface] = {}
+        self.atlases: List[pygame.Surface] = []
+
+    def _load_all(self, names) -> Dict[str, pygame.Surface]:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            jobs = {n: pool.submit(_decode, self.base / n, self.cache) for n in names}
+            return {n: _finish(job.result(), opaque=n in OPAQUE_IMAGES) for n, job in jobs.items()}
+
+    def load(self) -> "AssetManager":
+        loaded = self._load_all(OPAQUE_IMAGES + OVERLAY_IMAGES + SPRITE_IMAGES)
+        for name in OPAQUE_IMAGES:
+            self.images[Path(name).stem] = loaded[name]
+        for name in OVERLAY_IMAGES:
+            img = loaded[name]
+            img.set_alpha(255, pygame.RLEACCEL)
+            self.images[Path(name).stem] = img
+
+        sprites = {Path(n).stem: loaded[n] for n in SPRITE_IMAGES}
+        bake_variants(sprites)
+        self.atlases, regions = pack_atlas(sprites)
+        for name, region in regions.items():
+            region.set_alpha(255, pygame.RLEACCEL)
+        self.images.update(regions)
+        return self
+
+    def __getitem__(self, name: str) -> pygame.Surface:
+        return self.images[name]
+
+    def resident_bytes(self) -> int:
+        """Bytes de pixeles residentes (las subsurfaces comparten la página del atlas)."""
+        standalone = [s for s in self.images.values() if s.get_parent() is None]
+        return sum(_surface_bytes(s) for s in standalone + self.atlases)
+
+    def memory_report(self) -> str:
+        lines = [f"[Assets] {len(self.images)} imágenes, {len(self.atlases)} atlas"]
+        if self.cache is not None:
+            lines[0] += f", cache {self.cache.hits} aciertos / {self.cache.misses} fallos"
+        for name, surf in sorted(self.images.items()):
+            if surf.get_parent() is None:
+                lines.append(f"  {name:<22} {surf.get_width()}x{surf.get_height()} "
+                             f"{_surface_bytes(surf) / 1024:8.0f} KiB")
+        for i, page in enumerate(self.atlases):
+            used = sum(_surface_bytes(s) for s in self.images.values() if s.get_parent() is page)
+            lines.append(f"  atlas[{i}]               {page.get_width()}x{page.get_height()} "
+                         f"{_surface_bytes(page) / 1024:8.0f} KiB ({used / _surface_bytes(page):.0%} ocupado)")
+        lines.append(f"  total residente: {self.resident_bytes() / (1024 * 1024):.1f} MiB")
+        return "\n".join(lines)
@@ -0,0 +1,416 @@
+# event_file.py
+# Formato binario de grabaciones MIDI (.ubev), en lugar de listas pickle.
+# - Cabecera fija de 16 bytes + array de registros de ancho fijo
+# - Registro absoluto (8 B): tiempo u32 en unidades de `unit_us` + status,
+#   data1, data2 (+1 byte de relleno para alinear)
+# - Registro delta (5 B, flag DELTA): incremento u16 desde el anterior +
+#   status, data1, data2; los huecos más largos que 65535 unidades se parten
+#   con registros de relleno (status 0)
+# - El número de registros sale del tamaño del fichero: se puede añadir al
+#   final sin reescribir la cabecera (grabación en streaming)
+# - EventFile abre con numpy.memmap (tiempo constante) y chunks() recorre el
+#   fichero por trozos sin cargarlo entero
+#
+# También: importar/exportar Standard MIDI File y convertir los .pkl de
+# sandbox/midi/midi_rec.py.
+#
+#   python core/manager/event_file.py convert dato_duo_loop.pkl dato_duo_loop.ubev
+#   python core/manager/event_file.py convert loop.ubev loop.mid
+#   python core/manager/event_file.py info loop.ubev
+#   python core/manager/event_file.py recover grabacion.ubev   (tras un corte)
+
+from __future__ import annotations
+import argparse
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Iterator, Tuple
+import numpy as np
+
+MAGIC = b"UBEV"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI4x")  # magic, versión, flags, unit_us, reservado
+FLAG_DELTA = 0x1
+DEFAULT_UNIT_US = 100               # 0.1 ms: u32 absoluto llega a ~119 h
+FILLER = 0                          # status de los registros de relleno (modo delta)
+CHUNK_EVENTS = 4096
+
+RECORD_ABS = np.dtype([("t", "<u4"), ("status", "u1"), ("data1", "u1"), ("data2", "u1"), ("pad", "u1")])
+RECORD_DELTA = np.dtype([("dt", "<u2"), ("status", "u1"), ("data1", "u1"), ("data2", "u1")])
+MAX_DELTA = np.iinfo(np.uint16).max
+
+SMF_DIVISION = 480       # ticks por negra al exportar
+SMF_TEMPO_US = 500_000   # 120 BPM al exportar
+
+Events = Tuple[np.ndarray, np.ndarray]  # (tiempos en seg float64, mensajes (n, 3) uint8)
+
+
+def _as_events(times, msgs) -> Events:
+    times = np.asarray(times, dtype=np.float64).reshape(-1)
+    msgs = np.asarray(msgs, dtype=np.uint8).reshape(-1, 3)
+    if len(times) != len(msgs):
+        raise ValueError("times y msgs deben tener la misma longitud")
+    return times, msgs
+
+
+# ---------------------------------------------------------------------
+# Escritura
+# ---------------------------------------------------------------------
+class EventWriter:
+    """Añade eventos a un .ubev (crea la cabecera si el fichero no existe)."""
+
+    def __init__(self, path, delta: bool = False, unit_us: int = DEFAULT_UNIT_US):
+        self.path = Path(path)
+        exists = self.path.exists() and self.path.stat().st_size >= HEADER.size
+        if exists:
+            info = EventFile(self.path)
+            self.delta, self.unit_us = info.delta, info.unit_us
+            self._last = int(info.raw_times()[-1]) if len(info) else 0
+        else:
+            self.delta, self.unit_us = delta, unit_us
+            self._last = 0
+        self._f = open(self.path, "ab")
+        if not exists:
+            self._f.write(HEADER.pack(MAGIC, VERSION, FLAG_DELTA if delta else 0, unit_us))
+
+    def append(self, times, msgs) -> None:
+        """times en segundos (no decrecientes), msgs (n, 3)."""
+        times, msgs = _as_events(times, msgs)
+        if not len(times):
+            return
+        units = np.round(times * 1e6 / self.unit_us).astype(np.int64)
+        if units[0] < self._last or np.any(np.diff(units) < 0):
+            raise ValueError("los tiempos deben ser no decrecientes")
+        if self.delta:
+            rec = self._delta_records(units, msgs)
+        else:
+            rec = np.zeros(len(units), dtype=RECORD_ABS)
+            rec["t"] = units
+            rec["status"], rec["data1"], rec["data2"] = msgs.T
+        self._f.write(rec.tobytes())
+        self._last = int(units[-1])
+
+    @property
+    def last_time(self) -> float:
+        """Tiempo (seg) del último evento del fichero; lo siguiente no puede ser anterior."""
+        return self._last * self.unit_us / 1e6
+
+    def _delta_records(self, units, msgs) -> np.ndarray:
+        dts = np.diff(units, prepend=self._last)
+        fillers = np.maximum(0, (dts - 1) // MAX_DELTA)  # registros de relleno antes de cada evento
+        rec = np.zeros(len(units) + int(fillers.sum()), dtype=RECORD_DELTA)
+        pos = np.arange(len(units)) + np.cumsum(fillers)
+        rec["dt"][pos] = dts - fillers * MAX_DELTA
+        rec["status"][pos], rec["data1"][pos], rec["data2"][pos] = msgs.T
+        for i in np.flatnonzero(fillers):
+            rec["dt"][pos[i] - fillers[i]:pos[i]] = MAX_DELTA  # status FILLER
+        return rec
+
+    def flush(self, sync: bool = False) -> None:
+        self._f.flush()
+        if sync:
+            os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def write_events(path, times, msgs, delta: bool = False, unit_us: int = DEFAULT_UNIT_US) -> None:
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    with EventWriter(path, delta=delta, unit_us=unit_us) as w:
+        w.append(times, msgs)
+
+
+# ---------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------
+class EventFile:
+    def __init__(self, path):
+        """Abre un .ubev con memmap; no lee los registros hasta que se piden."""
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            head = f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            raise ValueError(f"{self.path}: fichero demasiado corto")
+        magic, version, flags, unit_us = HEADER.unpack(head)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path}: no es un .ubev v{VERSION}")
+        self.delta = bool(flags & FLAG_DELTA)
+        self.unit_us = unit_us
+        self.dtype = RECORD_DELTA if self.delta else RECORD_ABS
+        # Un registro a medio escribir al final (corte de luz) se ignora
+        n = (self.path.stat().st_size - HEADER.size) // self.dtype.itemsize
+        self.records = (np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER.size, shape=(n,))
+                        if n else np.zeros(0, dtype=self.dtype))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def raw_times(self) -> np.ndarray:
+        """Tiempos absolutos en unidades, relleno incluido."""
+        if self.delta:
+            return np.cumsum(self.records["dt"], dtype=np.int64)
+        return self.records["t"].astype(np.int64)
+
+    def _split(self, rec, units) -> Events:
+        keep = rec["status"] != FILLER
+        msgs = np.stack([rec["status"][keep], rec["data1"][keep], rec["data2"][keep]], axis=1)
+        return units[keep] * (self.unit_us / 1e6), msgs
+
+    def read(self) -> Events:
+        """Todos los eventos: (tiempos en seg, mensajes (n, 3))."""
+        return self._split(self.records, self.raw_times())
+
+    def chunks(self, size: int = CHUNK_EVENTS) -> Iterator[Events]:
+        """Recorre el fichero por trozos de `size` registros (streaming)."""
+        carry = 0
+        for start in range(0, len(self.records), size):
+            rec = self.records[start:start + size]
+            if self.delta:
+                units = carry + np.cumsum(rec["dt"], dtype=np.int64)
+                carry = int(units[-1])
+            else:
+                units = rec["t"].astype(np.int64)
+            yield self._split(rec, units)
+
+    @property
+    def duration(self) -> float:
+        if not len(self.records):
+            return 0.0
+        last = int(self.raw_times()[-1]) if self.delta else int(self.records["t"][-1])
+        return last * self.unit_us / 1e6
+
+
+def read_events(path) -> Events:
+    return EventFile(path).read()
+
+
+# ---------------------------------------------------------------------
+# pickle (sandbox/midi/midi_rec.py)
+# ---------------------------------------------------------------------
+def read_pickle(path) -> Events:
+    """[(t, [status, d1, d2]), ...] de midi_rec.py → (tiempos, mensajes)."""
+    with open(path, "rb") as f:
+        events = pickle.load(f)
+    times = [t for t, _ in events]
+    msgs = [(list(m) + [0, 0])[:3] for _, m in events]
+    return _as_events(times, msgs) if events else (np.zeros(0), np.zeros((0, 3), np.uint8))
+
+
+# ---------------------------------------------------------------------
+# Standard MIDI File
+# ---------------------------------------------------------------------
+def _data_len(status: int) -> int:
+    return 1 if status & 0xF0 in (0xC0, 0xD0) else 2
+
+
+def _read_vlq(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value = (value << 7) | (b & 0x7F)
+        if not b & 0x80:
+            return value, pos
+
+
+def _vlq(value: int) -> bytes:
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def read_smf(path) -> Events:
+    """Mensajes de canal de un SMF (formato 0 o 1), con el mapa de tempo aplicado."""
+    data = Path(path).read_bytes()
+    if data[:4] != b"MThd":
+        raise ValueError(f"{path}: no es un Standard MIDI File")
+    hlen = struct.unpack(">I", data[4:8])[0]
+    _, ntracks, division = struct.unpack(">HHh", data[8:14])
+    pos = 8 + hlen
+
+    raw = []  # (tick, pista, orden, tipo, valor)
+    for track in range(ntracks):
+        if data[pos:pos + 4] != b"MTrk":
+            raise ValueError(f"{path}: pista {track} sin cabecera MTrk")
+        end = pos + 8 + struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        pos += 8
+        tick, running = 0, None
+        while pos < end:
+            delta, pos = _read_vlq(data, pos)
+            tick += delta
+            status = data[pos]
+            if status == 0xFF:
+                kind = data[pos + 1]
+                length, pos = _read_vlq(data, pos + 2)
+                if kind == 0x51:
+                    raw.append((tick, track, len(raw), "tempo", int.from_bytes(data[pos:pos + 3], "big")))
+                pos += length
+                continue
+            if status in (0xF0, 0xF7):
+                length, pos = _read_vlq(data, pos + 1)
+                pos += length
+                continue
+            if status & 0x80:
+                running = status
+                pos += 1
+            elif running is None:
+                raise ValueError(f"{path}: running status sin status previo")
+            n = _data_len(running)
+            msg = (running, data[pos], data[pos + 1] if n == 2 else 0)
+            pos += n
+            raw.append((tick, track, len(raw), "msg", msg))
+        pos = end
+
+    raw.sort(key=lambda e: (e[0], e[1], e[2]))
+    if division < 0:  # SMPTE: -fps y ticks por frame
+        sec_per_tick = lambda tempo: 1.0 / (-(division >> 8) * (division & 0xFF))
+    else:
+        sec_per_tick = lambda tempo: tempo / 1e6 / division
+    times, msgs = [], []
+    tempo, last_tick, t = SMF_TEMPO_US, 0, 0.0
+    for tick, _, _, kind, value in raw:
+        t += (tick - last_tick) * sec_per_tick(tempo)
+        last_tick = tick
+        if kind == "tempo":
+            tempo = value
+        else:
+            times.append(t)
+            msgs.append(value)
+    return _as_events(times, msgs) if times else (np.zeros(0), np.zeros((0, 3), np.uint8))
+
+
+def write_smf(path, times, msgs, tempo_us: int = SMF_TEMPO_US, division: int = SMF_DIVISION) -> int:
+    """
+    SMF formato 0. Los mensajes de sistema (clock, start/stop...) no caben en
+    un SMF y se omiten. Devuelve cuántos mensajes se escribieron.
+    """
+    times, msgs = _as_events(times, msgs)
+    keep = msgs[:, 0] < 0xF0
+    times, msgs = times[keep], msgs[keep]
+    ticks = np.round(times * 1e6 / tempo_us * division).astype(np.int64)
+    track = bytearray(b"\x00\xFF\x51\x03" + tempo_us.to_bytes(3, "big"))
+    last = 0
+    for tick, (status, d1, d2) in zip(ticks.tolist(), msgs.tolist()):
+        track += _vlq(max(0, tick - last))
+        track += bytes((status, d1, d2)[:1 + _data_len(status)])
+        last = max(last, tick)
+    track += b"\x00\xFF\x2F\x00"
+    with open(path, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, division))
+        f.write(b"MTrk" + struct.pack(">I", len(track)) + track)
+    return len(times)
+
+
+# ---------------------------------------------------------------------
+# Recuperación
+# ---------------------------------------------------------------------
+def _valid_prefix(f: EventFile) -> int:
+    """Registros válidos desde el principio (tras un corte, el final puede ser basura o ceros)."""
+    rec = f.records
+    if f.delta:
+        ok = (rec["status"] >= 0x80) | ((rec["status"] == FILLER) & (rec["dt"] == MAX_DELTA))
+    else:
+        t = rec["t"].astype(np.int64)
+        ok = (rec["status"] >= 0x80) & (np.diff(t, prepend=0) >= 0)
+    bad = np.flatnonzero(~ok)
+    return int(bad[0]) if len(bad) else len(rec)
+
+
+def recover(src, dst=None) -> Tuple[int, int]:
+    """
+    Rehace un .ubev truncado (grabación cortada a mitad): se queda con los
+    registros completos y válidos desde el principio y descarta el resto.
+    dst=None → sustituye `src` (de forma atómica). Devuelve (conservados, descartados).
+    """
+    src = Path(src)
+    f = EventFile(src)
+    size = f.dtype.itemsize
+    total = -(-(src.stat().st_size - HEADER.size) // size)  # con el registro a medias
+    n = _valid_prefix(f)
+    if f.delta:
+        while n and f.records["status"][n - 1] == FILLER:  # relleno sin evento detrás
+            n -= 1
+    data = np.ascontiguousarray(f.records[:n]).tobytes()
+    header = HEADER.pack(MAGIC, VERSION, FLAG_DELTA if f.delta else 0, f.unit_us)
+    del f  # soltar el memmap antes de sustituir el fichero
+    dst = src if dst is None else Path(dst)
+    tmp = dst.with_name(dst.name + ".tmp")
+    with open(tmp, "wb") as out:
+        out.write(header + data)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, dst)
+    return n, total - n
+
+
+# ---------------------------------------------------------------------
+# Conversión
+# ---------------------------------------------------------------------
+def load_any(path) -> Events:
+    """.ubev, .pkl o .mid/.midi según la extensión."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pkl":
+        return read_pickle(path)
+    if suffix in (".mid", ".midi"):
+        return read_smf(path)
+    return read_events(path)
+
+
+def convert(src, dst, delta: bool = False, drop_realtime: bool = False) -> int:
+    """Convierte entre .pkl/.mid/.ubev según las extensiones. Devuelve eventos escritos."""
+    times, msgs = load_any(src)
+    if drop_realtime:
+        keep = msgs[:, 0] < 0xF8
+        times, msgs = times[keep], msgs[keep]
+    if Path(dst).suffix.lower() in (".mid", ".midi"):
+        return write_smf(dst, times, msgs)
+    write_events(dst, times, msgs, delta=delta)
+    return len(times)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Grabaciones MIDI en formato .ubev")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="convertir entre .pkl, .mid y .ubev")
+    c.add_argument("src")
+    c.add_argument("dst")
+    c.add_argument("--delta", action="store_true", help="registros delta (5 B en vez de 8 B)")
+    c.add_argument("--drop-realtime", action="store_true", help="descartar clock/start/stop...")
+    i = sub.add_parser("info", help="resumen de un fichero")
+    i.add_argument("path")
+    r = sub.add_parser("recover", help="rehacer un .ubev cortado a mitad de grabación")
+    r.add_argument("src")
+    r.add_argument("dst", nargs="?", help="por defecto se sustituye src")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "convert":
+        n = convert(args.src, args.dst, delta=args.delta, drop_realtime=args.drop_realtime)
+        print(f"{args.src} → {args.dst}: {n} eventos, "
+              f"{os.path.getsize(args.src)} → {os.path.getsize(args.dst)} bytes")
+    elif args.cmd == "recover":
+        kept, lost = recover(args.src, args.dst)
+        print(f"{args.dst or args.src}: {kept} eventos recuperados, {lost} registros descartados")
+    else:
+        times, msgs = load_any(args.path)
+        kinds, counts = np.unique(msgs[:, 0] if len(msgs) else np.zeros(0, np.uint8), return_counts=True)
+        print(f"{args.path}: {len(times)} eventos, {times[-1] if len(times) else 0:.3f} s")
+        for k, n in zip(kinds.tolist(), counts.tolist()):
+            print(f"  status 0x{k:02X}: {n}")
+
+
+if __name__ == "__main__":
+    main()
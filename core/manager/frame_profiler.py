@@ -0,0 +1,200 @@
+# frame_profiler.py
+# Medición por etapas del frame (MIDI, loop, update, draw, present...).
+# - Cada etapa se mide con `with profiler.stage("draw"):`
+# - Los tiempos se guardan en buffers circulares de tamaño fijo (NumPy)
+# - Overlay opcional en pantalla con ms por etapa y el peor frame reciente
+# - dump() escribe estadísticas e historial en JSON
+#
+# Desactivado, stage() devuelve un contexto vacío compartido y end_frame()
+# retorna enseguida: el coste es una llamada a método por etapa.
+
+from __future__ import annotations
+import json
+import time
+from typing import Dict, List, Sequence
+import numpy as np
+import pygame
+
+HISTORY_FRAMES = 1024   # frames guardados por etapa
+WORST_WINDOW = 5.0      # seg: ventana del "peor frame"
+OVERLAY_REFRESH = 0.25  # seg entre redibujados del texto del overlay
+OVERLAY_FONT_SIZE = 22
+OVERLAY_COLOR = (255, 255, 255)
+OVERLAY_BG = (0, 0, 0, 170)
+OVERLAY_POS = (8, 8)
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    __slots__ = ("_acc", "_idx", "_t0")
+
+    def __init__(self, acc: np.ndarray, idx: int):
+        self._acc = acc
+        self._idx = idx
+        self._t0 = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._acc[self._idx] += time.perf_counter() - self._t0
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, stages: Sequence[str], history: int = HISTORY_FRAMES, enabled: bool = False):
+        """
+        stages  : nombres de las etapas, en el orden del frame
+        history : frames que guarda cada buffer circular
+        enabled : medir desde el inicio
+        """
+        self.stages = list(stages)
+        self.history = history
+        self.enabled = enabled
+        self.show_overlay = False
+
+        n = len(self.stages)
+        self._acc = np.zeros(n)                  # frame en curso (seg por etapa)
+        self._scopes = {name: _Scope(self._acc, i) for i, name in enumerate(self.stages)}
+        self._stage_ms = np.zeros((history, n))  # ms por etapa
+        self._frame_ms = np.zeros(history)       # ms entre end_frame() sucesivos
+        self._stamp = np.zeros(history)          # perf_counter al cerrar el frame
+        self._pos = 0
+        self._count = 0
+        self._last_end = None
+
+        self._font = None
+        self._overlay = None
+        self._overlay_at = 0.0
+        self.overlay_rect = None
+
+    # --- medición ---
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_SCOPE
+        return self._scopes[name]
+
+    def end_frame(self) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        i = self._pos
+        self._stage_ms[i] = self._acc * 1000
+        self._frame_ms[i] = (now - self._last_end) * 1000 if self._last_end else self._stage_ms[i].sum()
+        self._stamp[i] = now
+        self._acc[:] = 0.0
+        self._last_end = now
+        self._pos = (i + 1) % self.history
+        self._count = min(self._count + 1, self.history)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._acc[:] = 0.0
+        self._last_end = None
+
+    def toggle_overlay(self) -> None:
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay and not self.enabled:
+            self.set_enabled(True)
+
+    # --- consultas ---
+    def _recent(self) -> slice:
+        return slice(0, self._count)
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """mean/p50/p95/p99/max en ms por etapa y para el frame completo."""
+        out = {}
+        if not self._count:
+            return out
+        rows = self._stage_ms[self._recent()]
+        columns = [(name, rows[:, i]) for i, name in enumerate(self.stages)]
+        columns.append(("frame", self._frame_ms[self._recent()]))
+        for name, col in columns:
+            p50, p95, p99 = np.percentile(col, [50, 95, 99])
+            out[name] = {"mean": float(col.mean()), "p50": float(p50), "p95": float(p95),
+                         "p99": float(p99), "max": float(col.max())}
+        return out
+
+    def worst_frame(self, seconds: float = WORST_WINDOW):
+        """(ms del frame, {etapa: ms}) del peor frame de los últimos `seconds`, o None."""
+        if not self._count:
+            return None
+        recent = self._recent()
+        stamps = self._stamp[recent]
+        mask = stamps >= stamps.max() - seconds
+        idx = np.flatnonzero(mask)[np.argmax(self._frame_ms[recent][mask])]
+        return float(self._frame_ms[idx]), dict(zip(self.stages, self._stage_ms[idx].tolist()))
+
+    def dump(self, path: str) -> None:
+        """Escribe estadísticas y el historial (en orden cronológico) en JSON."""
+        order = np.roll(np.arange(self.history), -self._pos)[-self._count:] if self._count else []
+        data = {
+            "stages": self.stages,
+            "frames": self._count,
+            "stats_ms": self.stage_stats(),
+            "worst_ms": self.worst_frame(),
+            "history_ms": {
+                "frame": self._frame_ms[order].round(3).tolist(),
+                **{name: self._stage_ms[order, i].round(3).tolist() for i, name in enumerate(self.stages)},
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+        print(f"[Profiler] {self._count} frames guardados en {path}")
+
+    # --- overlay ---
+    def _render_overlay(self) -> pygame.Surface:
+        if self._font is None:
+            self._font = pygame.font.Font(None, OVERLAY_FONT_SIZE)
+        stats = self.stage_stats()
+        lines: List[str] = [f"{'etapa':<10}{'p50':>7}{'p95':>7}{'max':>7}  ms"]
+        for name in self.stages + ["frame"]:
+            s = stats.get(name)
+            if s:
+                lines.append(f"{name:<10}{s['p50']:7.2f}{s['p95']:7.2f}{s['max']:7.2f}")
+        worst = self.worst_frame()
+        if worst:
+            ms, parts = worst
+            top = max(parts, key=parts.get)
+            lines.append(f"peor {WORST_WINDOW:.0f}s: {ms:.1f} ms ({top} {parts[top]:.1f})")
+        texts = [self._font.render(line, True, OVERLAY_COLOR) for line in lines]
+        w = max(t.get_width() for t in texts) + 12
+        h = sum(t.get_height() for t in texts) + 12
+        surf = pygame.Surface((w, h), pygame.SRCALPHA)
+        surf.fill(OVERLAY_BG)
+        y = 6
+        for t in texts:
+            surf.blit(t, (6, y))
+            y += t.get_height()
+        return surf
+
+    def overlay_surface(self):
+        """Superficie actual del overlay (se regenera cada OVERLAY_REFRESH), o None si está oculto."""
+        if not self.show_overlay:
+            return None
+        now = time.perf_counter()
+        if self._overlay is None or now - self._overlay_at >= OVERLAY_REFRESH:
+            self._overlay = self._render_overlay()
+            self._overlay_at = now
+        return self._overlay
+
+    def draw_overlay(self, surface: pygame.Surface):
+        """Pinta el overlay arriba a la izquierda. Devuelve su rect, o None si está oculto."""
+        overlay = self.overlay_surface()
+        if overlay is None:
+            return None
+        self.overlay_rect = surface.blit(overlay, OVERLAY_POS)
+        return self.overlay_rect
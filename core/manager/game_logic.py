@@ -4,6 +4,10 @@ sincronización MIDI, detección de aciertos, errores y control del flujo.
 """
 import time
 import pygame.midi
+from manager.midi_input import REALTIME, REALTIME_FILTER, InputStats, describe_filter, read_all, set_source_filter
+from manager.note_scheduler import NoteScheduler
+
+FEEDBACK_LENGTH = 0.05  # seg del sonido de acierto/error
 
 
 class GameLogic:
@@ -25,12 +29,22 @@ class GameLogic:
         pygame.midi.init()
         self.midi_in = None
         self.midi_out = None
+        self.notes = None
+        self.input_stats = InputStats()
         self.device_hint = midi_device_hint
 
     # ---------------------------------------------------------
     # INICIALIZACIÓN
     # ---------------------------------------------------------
-    def init_midi(self):
+    def init_midi(self, midi_in=None, midi_out=None):
+        """
+        Elige los dispositivos por consola. Si se pasan midi_in/midi_out (p. ej.
+        los de manager.virtual_midi) se usan sin preguntar.
+        """
+        if midi_in is not None and midi_out is not None:
+            self._open(midi_in, midi_out)
+            return
+
         print("=== Entradas MIDI disponibles ===")
         for i in range(pygame.midi.get_count()):
             interf, name, inp, outp, opened = pygame.midi.get_device_info(i)
@@ -47,8 +61,14 @@ class GameLogic:
 
         output_id = int(input("\nSelecciona ID de salida (Microsoft GS Wavetable Synth): "))
 
-        self.midi_in = pygame.midi.Input(input_id)
-        self.midi_out = pygame.midi.Output(output_id)
+        self._open(pygame.midi.Input(input_id), pygame.midi.Output(output_id))
+
+    def _open(self, midi_in, midi_out):
+        self.midi_in = midi_in
+        if set_source_filter(self.midi_in, REALTIME_FILTER):  # clock del DUO fuera, ya en PortMidi
+            self.input_stats.source_filter = describe_filter(REALTIME_FILTER)
+        self.midi_out = midi_out
+        self.notes = NoteScheduler(self.midi_out)
         print("[MIDI] Configuración completa ✅")
 
     # ---------------------------------------------------------
@@ -75,18 +95,24 @@ class GameLogic:
         """Lee los mensajes MIDI y compara con la línea de tiempo esperada."""
         if not self.midi_in or not self.active:
             return
+        self.notes.service()
         now = time.time() - self.start_time
 
-        if self.midi_in.poll():
-            events = self.midi_in.read(10)
-           
-            for data, ts in events:
-                status, cc, value, _ = data
+        stats = self.input_stats
+        stats.backlog = 0
+        for data, ts in read_all(self.midi_in):
+            status, cc, value, _ = data
+            stats.seen += 1
+            if status in REALTIME:
+                stats.dropped += 1
+                continue
+            stats.backlog += 1
 
-                # Mensaje de "golpe" CC81 → representa crush o golpe de pad
-                if (status & 0xF0) == 0xB0 and cc == 81 and value >= 64:
-                    print(f"[MIDI] Golpe detectado en t={now:.2f}")
-                    self._evaluate_hit(now, graphics_manager)
+            # Mensaje de "golpe" CC81 → representa crush o golpe de pad
+            if (status & 0xF0) == 0xB0 and cc == 81 and value >= 64:
+                print(f"[MIDI] Golpe detectado en t={now:.2f}")
+                self._evaluate_hit(now, graphics_manager)
+        stats.max_backlog = max(stats.max_backlog, stats.backlog)
 
     def _evaluate_hit(self, hit_time, graphics_manager):
         """Evalúa si el golpe coincide con algún tiempo de la matriz de referencia."""
@@ -113,15 +139,14 @@ class GameLogic:
     def play_feedback(self, success=True):
         """Reproduce un sonido breve de confirmación (diferente para acierto/error)."""
         note = 76 if success else 30
-        self.midi_out.note_on(note, 127, self.channel)
-        time.sleep(0.05)
-        self.midi_out.note_off(note, 0, self.channel)
+        self.notes.play(note, 127, FEEDBACK_LENGTH, self.channel)
 
     def stop(self):
         self.active = False
         if self.midi_in:
             del self.midi_in
         if self.midi_out:
+            self.notes.flush()
             self.midi_out.close()
         pygame.midi.quit()
         print("[GameLogic] MIDI detenido correctamente.")
@@ -1,19 +1,30 @@
 import random
 import time
+from collections import OrderedDict
 from pathlib import Path
 import pygame
+from manager.asset_manager import AssetManager
+from manager.particle_manager import ParticleManager
+from manager.quality_manager import QUALITY_TIERS
 
 # --- Constantes ---
 RAYO_DURATION = 0.3
 HIT_FLASH_DURATION = 0.3
 MSG_DURATION = 0.8
-LOOP_LENGTH = 3.75
+LOOP_LENGTH = 3.75  # seg, sin TempoTracker
 HIT_WINDOW = 0.12
 CLOUDIA_SPEED = 234
 CLOUDIA_PAUSE = 0
 FALL_SPEED = 400.0  # velocidad de caída
 TICK_LENGTH = 0.1
 ERR_MSG = 1.5
+MSG_FONT_SIZE = 72
+MSG_COLOR = (64, 36, 15)
+TEXT_CACHE_SIZE = 32
+FLASH_COLOR = (255, 255, 255)
+FLASH_ALPHA = 70
+DIRTY_MAX_RECTS = 16   # más regiones (ya fusionadas) → redibujado completo + flip()
+DIRTY_MAX_AREA = 0.4   # fracción de pantalla sucia a partir de la cual se redibuja todo
 
 # ---------------------------------------------------------------------
 # Utilidades
@@ -27,19 +38,75 @@ def _resolve_assets_path(override: str | None) -> Path:
     raise FileNotFoundError("No se encontró 'assets/images' subiendo desde utils/.")
 
 
-def _load_img(base: Path, name: str) -> pygame.Surface:
-    full = base / name
-    if not full.exists():
-        raise FileNotFoundError(f"[Graphics] Falta asset: {full}")
-    return pygame.image.load(str(full)).convert_alpha()
-
-
-def _tint(surf: pygame.Surface, tint_color=(120, 180, 255), strength=80) -> pygame.Surface:
-    copy = surf.copy()
-    overlay = pygame.Surface(copy.get_size(), pygame.SRCALPHA)
-    overlay.fill((*tint_color, strength))
-    copy.blit(overlay, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
-    return copy
+def _merge_rects(rects, bounds: pygame.Rect) -> list:
+    """Recorta los rects a la pantalla y fusiona los que se solapan."""
+    merged = []
+    for r in rects:
+        r = r.clip(bounds)
+        if not r.w or not r.h:
+            continue
+        i = r.collidelist(merged)
+        while i != -1:
+            r.union_ip(merged.pop(i))
+            i = r.collidelist(merged)
+        merged.append(r)
+    return merged
+
+
+class TextCache:
+    """Cache LRU de textos renderizados, con clave (texto, tamaño, color)."""
+    def __init__(self, max_items: int = TEXT_CACHE_SIZE):
+        self.max_items = max_items
+        self._fonts = {}
+        self._items = OrderedDict()
+        self.allocs = 0  # superficies creadas (fallos de cache)
+
+    def render(self, text: str, size: int, color) -> pygame.Surface:
+        key = (text, size, tuple(color))
+        surf = self._items.get(key)
+        if surf is not None:
+            self._items.move_to_end(key)
+            return surf
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        surf = font.render(text, True, color)
+        self.allocs += 1
+        self._items[key] = surf
+        if len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+        return surf
+
+    def surfaces(self) -> list:
+        return list(self._items.values())
+
+
+def _scale_surface(surf: pygame.Surface, scale: float) -> pygame.Surface:
+    w, h = surf.get_size()
+    out = pygame.transform.smoothscale(surf, (max(1, round(w * scale)), max(1, round(h * scale))))
+    if out.get_flags() & pygame.SRCALPHA:
+        out.set_alpha(255, pygame.RLEACCEL)
+    return out
+
+
+class _ScaledSet:
+    """Copia pre-escalada de los assets y del destino de render para un nivel de calidad."""
+    def __init__(self, scale: float, screen_size, surfaces):
+        self.scale = scale
+        size = (round(screen_size[0] * scale), round(screen_size[1] * scale))
+        self.target = pygame.Surface(size).convert()
+        self.static_layer = pygame.Surface(size).convert()
+        self.flash_overlay = pygame.Surface(size).convert()
+        self.flash_overlay.fill(FLASH_COLOR)
+        self.flash_overlay.set_alpha(FLASH_ALPHA)
+        self.table = {}
+        for surf in surfaces:
+            self.add(surf)
+
+    def add(self, surf: pygame.Surface) -> pygame.Surface:
+        scaled = _scale_surface(surf, self.scale)
+        self.table[id(surf)] = (surf, scaled)
+        return scaled
 
 
 # ---------------------------------------------------------------------
@@ -58,9 +125,9 @@ class Cloud(pygame.sprite.Sprite):
 
 
 class CloudIA:
-    def __init__(self, image: pygame.Surface, screen_width: int):
+    def __init__(self, image: pygame.Surface, screen_width: int, image_left: pygame.Surface | None = None):
         self.image_right = image
-        self.image_left = pygame.transform.flip(image, True, False)
+        self.image_left = image_left or pygame.transform.flip(image, True, False)
         self.image = self.image_left
         self.rect = self.image.get_rect(midtop=(screen_width // 2, 20))
         self.direction = 1
@@ -69,48 +136,38 @@ class CloudIA:
         self.pause_until = 0.0
         self.screen_width = screen_width
         self.oldtime = time.time()
-
-    def update(self, dt):
-        if time.time() < self.pause_until:
+        self.prev_x = self.x
+
+    def update(self, dt, now=None):
+        """Avanza dt segundos; `now` es el instante simulado (por defecto time.time())."""
+        if now is None:
+            now = time.time()
+        self.prev_x = self.x
+        if now < self.pause_until:
             return
         self.x += self.direction * self.speed * dt
         if self.x <= 20:
             self.direction = 1
             self.image = self.image_left
-            self.pause_until = time.time() + CLOUDIA_PAUSE
+            self.pause_until = now + CLOUDIA_PAUSE
             #calibrar tiempo
-            #print("Cloudia ->", time.time()-self.oldtime)
+            #print("Cloudia ->", now-self.oldtime)
             
-            self.oldtime = time.time()
+            self.oldtime = now
         elif self.x + self.rect.width >= self.screen_width - 20:
             self.direction = -1
             self.image = self.image_right
-            self.pause_until = time.time() + CLOUDIA_PAUSE
+            self.pause_until = now + CLOUDIA_PAUSE
             #calibrar tiempo
-            #print("Cloudia <-", time.time()-self.oldtime)
+            #print("Cloudia <-", now-self.oldtime)
             
-            self.oldtime = time.time()
+            self.oldtime = now
         self.rect.x = int(self.x)
 
-
-class FallingEffect:
-    """Rayos o notas que caen"""
-    def __init__(self, image: pygame.Surface, x: int, y_start: int, duration: float = RAYO_DURATION, vy: float = FALL_SPEED):
-        self.image = image
-        self.x = x - image.get_width() // 2
-        self.y = float(y_start)
-        self.vy = vy
-        self.until = time.time() + duration
-
-    @property
-    def alive(self) -> bool:
-        return time.time() < self.until
-
-    def update(self, dt):
-        self.y += self.vy * dt
-
-    def draw(self, surface: pygame.Surface):
-        surface.blit(self.image, (int(self.x), int(self.y)))
+    def render_rect(self, alpha: float = 1.0) -> pygame.Rect:
+        """Rect interpolado entre el paso de simulación anterior (0) y el actual (1)."""
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        return self.rect.move(int(x) - self.rect.x, 0)
 
 
 # ---------------------------------------------------------------------
@@ -118,9 +175,27 @@ class FallingEffect:
 # ---------------------------------------------------------------------
 class GraphicsManager:
     """Gestiona todo el render y la lógica visual."""
-    def __init__(self, assets_dir: str | None = None):
+    def __init__(self, assets_dir: str | None = None, dirty_rects: bool = True, debug: bool = False,
+                 asset_cache: bool = True, quality_tiers=QUALITY_TIERS):
+        """
+        assets_dir    : ruta alternativa a assets/images
+        asset_cache   : reutilizar los pixeles ya decodificados de arranques anteriores
+        quality_tiers : niveles de calidad posibles; cada escala < 1 se pre-escala al cargar
+        dirty_rects : si True, draw() sólo repinta las regiones que cambiaron;
+                      si False, redibuja la pantalla completa cada frame.
+        debug       : avisa por consola si draw() crea superficies
+        """
         self._assets_dir_override = assets_dir
         self.screen = None
+        self.assets = None
+        self.dirty_rects = dirty_rects
+        self.debug = debug
+        self.asset_cache = asset_cache
+
+        # Calidad (ver quality_manager): nivel activo y assets pre-escalados por escala
+        self.quality_tiers = list(quality_tiers)
+        self.quality = self.quality_tiers[0]
+        self._scaled = {}
 
         # Fondos
         self.bg_default = self.bg_level = self.bg_active = None
@@ -144,12 +219,14 @@ class GraphicsManager:
         self.inst_to_cloud_index = {}
         self.start_ts = None
         self.last_phase = 0.0
+        self.tempo = None          # TempoTracker: fase en tiempos en vez de segundos
+        self._perf_offset = 0.0    # perf_counter - time.time (el tracker va en perf_counter)
 
         # Nube seleccionada
         self.selected_cloud_index = 0
 
-        # Rayos / notas
-        self.effects = []
+        # Rayos / notas (se crea en load_assets)
+        self.particles = None
 
         # Progreso
         self.patterns_completed = [False, False, False]
@@ -159,38 +236,67 @@ class GraphicsManager:
         self.curr_msg = ""
         self.end_status = False
 
+        # Capa estática (fondos + nubes + hint) precompuesta
+        self._static_layer = None
+        self._static_dirty = True
+        self.frame_blits = 0  # blits del último draw(), incluida la reconstrucción
+
+        # Superficies reutilizables del draw
+        self.text_cache = TextCache()
+        self.flash_overlay = None
+        self.frame_allocs = 0  # superficies creadas en el último draw()
+        self.total_allocs = 0
+
+        # Dirty rects: estado del frame anterior
+        self._full_redraw = True
+        self._prev_moving = []
+        self._prev_state = None
+        self._prev_msg_area = None
+        self._msg_area = None
+        self._extra_dirty = []
+
     # --- carga ---
-    def load_assets(self, screen: pygame.Surface):
+    def load_assets(self, screen: pygame.Surface, messages=(), prescale=True):
+        """
+        Carga imágenes y pre-renderiza los mensajes fijos del juego.
+        prescale : pre-escalar los assets para cada escala de quality_tiers
+                   (solo los usa draw(); con el backend sdl2 escala el renderer)
+        """
         self.screen = screen
         self.base_f = _resolve_assets_path(self._assets_dir_override)
-        base = self.base_f
+        t0 = time.perf_counter()
+        self.assets = AssetManager(self.base_f, use_cache=self.asset_cache).load()
+        print(self.assets.memory_report())
+        print(f"[Assets] Cargados en {(time.perf_counter() - t0) * 1000:.0f} ms")
+        img = self.assets
 
         # Fondos
-        self.bg_default = _load_img(base, "background15.png")
-        self.bg_grey = _load_img(base, "background16.png")
-        self.bg_hint = _load_img(base, "background17.png")
-        self.hint = _load_img(base, "hint.png")
-        self.bg_level = _load_img(base, "background2.png")
-        self.bg_active = _load_img(base, "background1.png")
+        self.bg_default = img["background15"]
+        self.bg_grey = img["background16"]
+        self.bg_hint = img["background17"]
+        self.hint = img["hint"]
+        self.bg_level = img["background2"]
+        self.bg_active = img["background1"]
         self.bgs = [self.bg_default, self.bg_grey, self.bg_hint]
         self.current_bg = self.bgs[self.selected_cloud_index]
 
         # Sprites
-        self.rayo_img = _load_img(base, "malo.png")
-        self.nota_img = _load_img(base, "nota.png")
+        self.rayo_img = img["malo"]
+        self.nota_img = img["nota"]
 
         self.anim_img = self.rayo_img
+        self.particles = ParticleManager([self.rayo_img, self.nota_img], bottom=screen.get_height())
 
-        self.cloud_imgs = [_load_img(base, f"cloud{i}a.png") for i in range(1, 4)]
-        self.cloud_imgs_sel = [_tint(img, (120, 200, 255), 20) for img in self.cloud_imgs]
+        self.cloud_imgs = [img[f"cloud{i}a"] for i in range(1, 4)]
+        self.cloud_imgs_sel = [img[f"cloud{i}a_sel"] for i in range(1, 4)]
         self.width = screen.get_width()
         W, H = screen.get_width(), screen.get_height()
-        self.cloudia = CloudIA(_load_img(base, "cloudia.png"), W)
+        self.cloudia = CloudIA(img["cloudia"], W, image_left=img["cloudia_flip"])
 
-        self.main_idle = _load_img(base, "tambor_g.png")
-        self.main_hit = _load_img(base, "tambor_gs.png")
-        self.side_idle = _load_img(base, "tambor_p_player.png")
-        self.side_hit = _load_img(base, "tambor_p_player2.png")
+        self.main_idle = img["tambor_g"]
+        self.main_hit = img["tambor_gs"]
+        self.side_idle = img["tambor_p_player"]
+        self.side_hit = img["tambor_p_player2"]
 
         self.main_rect = self.main_idle.get_rect(midbottom=(W // 2, H - 220))
         self.side1_rect = self.side_idle.get_rect(midbottom=(W // 2 - 290, H - 110))
@@ -199,20 +305,52 @@ class GraphicsManager:
 
         self._place_clouds(self.cloud_imgs, self.cloud_imgs_sel, W)
 
-        self.msg = _load_img(base, "msg.png")
+        self.msg = img["msg"]
         self.msg_rect = self.msg.get_rect(midbottom=(W // 2, 120 + (H // 2)))
 
+        for m in messages:
+            self.text_cache.render(m, MSG_FONT_SIZE, MSG_COLOR)
+        self._static_layer = pygame.Surface(screen.get_size()).convert()
+        self.flash_overlay = pygame.Surface(screen.get_size()).convert()
+        self.flash_overlay.fill(FLASH_COLOR)
+        self.flash_overlay.set_alpha(FLASH_ALPHA)
+
+        scales = sorted({t.scale for t in self.quality_tiers if t.scale != 1.0}) if prescale else []
+        to_scale = list(self.assets.images.values()) + self.text_cache.surfaces()
+        self._scaled = {sc: _ScaledSet(sc, screen.get_size(), to_scale) for sc in scales}
+        self.set_quality(self.quality)
+
+    def invalidate(self):
+        """Marca la capa estática como obsoleta; se recompone y redibuja todo en el próximo draw()."""
+        self._static_dirty = True
+        self._full_redraw = True
+
+    def set_quality(self, tier):
+        """Aplica un QualityTier: escala del render, límite de partículas y flash."""
+        self.quality = tier
+        if self.particles is not None:
+            self.particles.set_limit(tier.max_particles)
+        self.invalidate()
+
+    def mark_dirty(self, rect):
+        """Repinta `rect` en el próximo draw() (para lo que se pinta encima de la escena)."""
+        self._extra_dirty.append(pygame.Rect(rect))
+
     def set_end_status(self):
         self.end_status = True
+        self.invalidate()
     
     def tick(self):
         self.tick_until = time.time() + TICK_LENGTH
 
     def set_nube_buena(self, nube):
-        self.cloud_imgs[nube] = _load_img(self.base_f, f"cloud{nube+1}.png")
+        self.cloud_imgs[nube] = self.assets[f"cloud{nube+1}"]
+        self.cloud_imgs_sel[nube] = self.assets[f"cloud{nube+1}_sel"]
+        self.invalidate()
     
     def update_bg(self):
         self.current_bg = self.bgs[self.selected_cloud_index]
+        self.invalidate()
 
     def _place_clouds(self, imgs, sel_imgs, W):
         rows_y = [60, 120, 180]
@@ -233,6 +371,7 @@ class GraphicsManager:
             self.cloud_list.append(c)
         #OJO
         self._apply_selection(self.selected_cloud_index)
+        self.invalidate()
 
     # --- matriz ---
     def set_timeline_from_matrix(self, matrix):
@@ -242,7 +381,21 @@ class GraphicsManager:
         self.start_ts = time.time()
         self.last_phase = 0.0
 
-    def _phase(self): return (time.time() - self.start_ts) % LOOP_LENGTH if self.start_ts else 0.0
+    def set_tempo(self, tempo):
+        """
+        Sigue el loop del TempoTracker: la matriz de set_timeline_from_matrix
+        pasa a estar en tiempos (negras) dentro del loop.
+        """
+        self.tempo = tempo
+        self._perf_offset = time.perf_counter() - time.time()
+
+    def _phase(self, now=None):
+        now = time.time() if now is None else now
+        if self.tempo is not None:
+            return self.tempo.loop_phase(now + self._perf_offset)
+        if not self.start_ts:
+            return 0.0
+        return (now - self.start_ts) % LOOP_LENGTH
     def _crossed(self, last, now, t):
         return (last < t <= now) if now >= last else (t > last or t <= now)
 
@@ -257,6 +410,7 @@ class GraphicsManager:
         self.selected_cloud_index = idx
         for i, c in enumerate(self.cloud_list):
             c.set_selected(i == idx)
+        self.invalidate()
 
     def next_nube(self):
         if self.selected_cloud_index < 3:
@@ -299,11 +453,15 @@ class GraphicsManager:
         self.side_hit_until = time.time() + HIT_FLASH_DURATION
 
     # --- update ---
-    def update(self, dt):
+    def update(self, dt, now=None):
+        """
+        Avanza la simulación visual dt segundos.
+        now: instante simulado al final del paso (paso fijo); por defecto time.time().
+        """
         if self.cloudia:
-            self.cloudia.update(dt)
+            self.cloudia.update(dt, now)
         if not self.reference_matrix: return
-        now_phase = self._phase()
+        now_phase = self._phase(now)
         
         #for i, inst in enumerate(self.inst_order):
         #    for t in self.reference_matrix[inst]:
@@ -319,55 +477,178 @@ class GraphicsManager:
         for t in self.reference_matrix[inst]:
             if self._crossed(self.last_phase, now_phase, t):
                 c = self.cloud_list[i]
-                self.effects.append(FallingEffect(self.anim_img, c.rect.centerx, c.rect.bottom - 10))
+                self.particles.spawn(self.anim_img, c.rect.centerx, c.rect.bottom - 10,
+                                     RAYO_DURATION, vy=FALL_SPEED)
 
         
         self.last_phase = now_phase
-        self._update_effects(dt)
-
-    def _update_effects(self, dt):
-        H = self.screen.get_height()
-        alive = []
-        for e in self.effects:
-            e.update(dt)
-            if e.alive and e.y < H:
-                alive.append(e)
-        self.effects = alive
+        self.particles.update(dt)
 
     # --- draw ---
-    def draw(self):
-        self.screen.blit(self.current_bg, (0, 0))
-        self.screen.blit(self.bg_level, (0, 0))
-        #if self.bg_level: self.screen.blit(self.bg_level, (0, 0))
-        self.clouds_group.draw(self.screen)
-        if self.cloudia: self.screen.blit(self.cloudia.image, self.cloudia.rect)
-        img = self.main_hit if time.time() < self.main_hit_until else self.main_idle
-        self.screen.blit(img, self.main_rect)
-
-        imgs = self.side_hit if time.time() < self.side_hit_until else self.side_idle
-        self.screen.blit(imgs, self.side1_rect)
-        self.screen.blit(imgs, self.side2_rect)
-        
-        for e in self.effects:
-            e.draw(self.screen)
-
+    def _static_items(self) -> list:
+        """Fondo, nivel, nubes y hint: lo que compone la capa estática."""
+        static = [(self.current_bg, (0, 0)), (self.bg_level, (0, 0))]
+        static.extend((c.image, c.rect) for c in self.clouds_group)
         if all(self.patterns_completed) and self.end_status == False:
-            self.screen.blit(self.hint, (0,0))
+            static.append((self.hint, (0, 0)))
+        return static
+
+    def _rebuild_static(self):
+        """Compone fondo, nivel, nubes y hint en una sola superficie opaca."""
+        layer = self._static_layer
+        layer.fill((0, 0, 0))
+        static = self._static_items()
+        layer.blits(static, doreturn=False)
+        self.frame_blits += len(static)
+        sc = self._scaled.get(self.quality.scale)
+        if sc:
+            pygame.transform.smoothscale(layer, sc.static_layer.get_size(), sc.static_layer)
+        self._static_dirty = False
+
+    def _scene(self, now: float, cloudia_rect, particles, static) -> list:
+        """Lista de (surface, pos) del frame actual, en orden de pintado, empezando por `static`."""
+        scene = static
+        if self.cloudia: scene.append((self.cloudia.image, cloudia_rect))
+        img = self.main_hit if now < self.main_hit_until else self.main_idle
+        scene.append((img, self.main_rect))
+
+        imgs = self.side_hit if now < self.side_hit_until else self.side_idle
+        scene.append((imgs, self.side1_rect))
+        scene.append((imgs, self.side2_rect))
+
+        scene.extend(particles)
+
         # Mensaje de celebración
-        if time.time() < self.celebration_until or self.end_status:
-            self.screen.blit(self.msg, self.msg_rect)
-            #overlay = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
-            #overlay.fill((64, 36, 15, 80))
-            #self.screen.blit(overlay, (0, 0))
-            font = pygame.font.Font(None, 72)
-            text = font.render(self.curr_msg, True, (64, 36, 15))
+        self._msg_area = None
+        if now < self.celebration_until or self.end_status:
+            scene.append((self.msg, self.msg_rect))
+            text = self.text_cache.render(self.curr_msg, MSG_FONT_SIZE, MSG_COLOR)
             rect = text.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() // 2))
-            self.screen.blit(text, rect)
-        
-        if time.time() < self.tick_until:
-            overlay = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
-            overlay.fill((255, 255, 255, 70))
-            self.screen.blit(overlay, (0, 0))
+            scene.append((text, rect))
+            self._msg_area = self.msg_rect.union(rect)
+
+        if now < self.tick_until and self.quality.flash:
+            scene.append((self.flash_overlay, (0, 0)))
+        return scene
+
+    def _draw_scaled(self, scene, sc: _ScaledSet):
+        """Pinta la escena con los assets pre-escalados y la amplía a la pantalla."""
+        s = sc.scale
+        items = []
+        for surf, pos in scene:
+            if surf is self._static_layer:
+                img = sc.static_layer
+            elif surf is self.flash_overlay:
+                img = sc.flash_overlay
+            else:
+                entry = sc.table.get(id(surf))
+                if entry is None or entry[0] is not surf:
+                    img = sc.add(surf)  # p. ej. un texto que no estaba pre-renderizado
+                    self.frame_allocs += 1
+                else:
+                    img = entry[1]
+            items.append((img, (int(pos[0] * s), int(pos[1] * s))))
+        sc.target.blits(items, doreturn=False)
+        pygame.transform.scale(sc.target, self.screen.get_size(), self.screen)
+        self.frame_blits += len(items) + 1
+
+    def _dirty_regions(self, state, moving):
+        """
+        Regiones que cambiaron respecto al frame anterior, o None si sale más
+        barato redibujar toda la pantalla (demasiadas regiones o demasiada área).
+        """
+        dirty = self._prev_moving + moving + self._extra_dirty
+        prev = self._prev_state
+        if state[0] != prev[0]:
+            dirty.append(self.main_idle.get_rect(topleft=self.main_rect.topleft))
+            dirty.append(self.main_hit.get_rect(topleft=self.main_rect.topleft))
+        if state[1] != prev[1]:
+            for r in (self.side1_rect, self.side2_rect):
+                dirty.append(self.side_idle.get_rect(topleft=r.topleft))
+                dirty.append(self.side_hit.get_rect(topleft=r.topleft))
+        if state[2:4] != prev[2:4]:
+            for area in (self._prev_msg_area, self._msg_area):
+                if area: dirty.append(area)
+        if len(dirty) > 4 * DIRTY_MAX_RECTS:
+            return None  # fusionarlos (cuadrático) ya cuesta más que el redibujado
+        bounds = self.screen.get_rect()
+        rects = _merge_rects(dirty, bounds)
+        if (len(rects) > DIRTY_MAX_RECTS
+                or sum(r.w * r.h for r in rects) > DIRTY_MAX_AREA * bounds.w * bounds.h):
+            return None
+        return rects
+
+    def resident_surfaces(self) -> list:
+        """Superficies que viven todo el juego: assets, textos pre-renderizados y flash."""
+        return list(self.assets.images.values()) + self.text_cache.surfaces() + [self.flash_overlay]
+
+    def scene(self, alpha: float = 1.0) -> list:
+        """
+        Display list del frame para backends que no pintan sobre self.screen
+        (ver texture_renderer): la escena estática va por capas, sin precomponer.
+        """
+        now = time.time()
+        text_allocs = self.text_cache.allocs
+        cloudia_rect = self.cloudia.render_rect(alpha) if self.cloudia else None
+        particles, _ = self.particles.draw_lists(alpha)
+        scene = self._scene(now, cloudia_rect, particles, self._static_items())
+        self.frame_allocs = self.text_cache.allocs - text_allocs
+        self.total_allocs += self.frame_allocs
+        self.frame_blits = len(scene)
+        return scene
+
+    def draw(self, alpha: float = 1.0):
+        """
+        Pinta el frame actual. alpha ∈ [0, 1] interpola CloudIA y las partículas
+        entre el paso de simulación anterior y el actual.
+        Devuelve la lista de rects a pasar a pygame.display.update(), o None
+        si se redibujó toda la pantalla (usar pygame.display.flip()).
+        """
+        now = time.time()
+        self.frame_blits = 0
+        self.frame_allocs = 0
+        text_allocs = self.text_cache.allocs
+        if self._static_dirty:
+            self._rebuild_static()
+        cloudia_rect = self.cloudia.render_rect(alpha) if self.cloudia else None
+        particles, moving = self.particles.draw_lists(alpha)
+        if cloudia_rect:
+            moving.append(cloudia_rect)
+        scene = self._scene(now, cloudia_rect, particles, [(self._static_layer, (0, 0))])
+        self.frame_allocs += self.text_cache.allocs - text_allocs
+        flash = now < self.tick_until and self.quality.flash
+        state = (now < self.main_hit_until, now < self.side_hit_until,
+                 self._msg_area is not None, self.curr_msg, flash)
+
+        sc = self._scaled.get(self.quality.scale)
+        full = (not self.dirty_rects or self._full_redraw or self._prev_state is None
+                or flash or self._prev_state[4])
+        rects = None if sc or full else self._dirty_regions(state, moving)
+        if sc:
+            # Render reducido: siempre se amplía la pantalla completa
+            self._draw_scaled(scene, sc)
+        elif rects is None:
+            self.screen.blits(scene, doreturn=False)
+            self.frame_blits += len(scene)
+        else:
+            # Por región, solo lo que la toca (la capa estática siempre)
+            boxes = [pygame.Rect(pos[0], pos[1], *surf.get_size()) for surf, pos in scene]
+            for r in rects:
+                items = [scene[i] for i in r.collidelistall(boxes)]
+                self.screen.set_clip(r)
+                self.screen.blits(items, doreturn=False)
+                self.frame_blits += len(items)
+            self.screen.set_clip(None)
+
+        self.total_allocs += self.frame_allocs
+        if self.debug and self.frame_allocs:
+            print(f"[Graphics] draw() creó {self.frame_allocs} superficies (total {self.total_allocs})")
+        self._full_redraw = False
+        self._extra_dirty.clear()
+        self._prev_moving = moving
+        self._prev_state = state
+        self._prev_msg_area = self._msg_area
+        return rects
 
 
     # --- extra ---
@@ -376,3 +657,4 @@ class GraphicsManager:
 
     def set_active_background(self, active: bool):
         self.current_bg = self.bg_active if active else self.bg_default
+        self.invalidate()
@@ -1,52 +1,112 @@
 import pygame
 import time
 import numpy as np
+from manager.rhythm_match import best_rotation, cyclic_ioi
+
+
+# Evaluación incremental:
+# - Los golpes van a un buffer circular de capacidad fija (tiempos absolutos de
+#   perf_counter), no a listas que se vacían en cada reset: la comparación
+#   mira los golpes del último loop (ventana deslizante hasta el último
+#   golpe), así que un patrón que cruza el borde del loop también cuenta
+# - El resultado se guarda y solo se recalcula cuando llega un golpe (o cambia
+#   la referencia / el modo / empieza loop); update() en cada frame no cuesta nada
+# - Las distancias de la referencia se calculan una vez, en set_expected()
+# - Con rotation=True (modo beat) da igual en qué golpe del patrón empiece el
+#   jugador: se busca el giro de la referencia que mejor encaja (rhythm_match)
+
+INPUT_CAPACITY = 64     # golpes recordados (la melodía más larga tiene 22)
+BEAT_TOLERANCE = 0.12   # seg de margen por distancia entre golpes (modo beat)
+MELODY_TOLERANCE = 0.01
 
 
 class LoopManager:
-    def __init__(self, expected_events, window):
+    def __init__(self, expected_events, window, tempo=None, capacity=INPUT_CAPACITY, rotation=False):
         """
         expected_events: lista de segundos en los que el usuario debe hacer eventos.
         window: tamaño de la ventana móvil.
+        tempo: TempoTracker opcional; si se da, los loops empiezan y acaban con
+               los del reloj MIDI y `window` se ignora.
+        capacity: golpes que caben en el buffer circular.
+        rotation: en modo beat, aceptar el patrón empezado en cualquiera de sus golpes.
         """
-        self.expected = np.array(expected_events)
         self.window = window
+        self.tempo = tempo
+        self.rotation = rotation
+        self.last_match = None  # RotationMatch de la última evaluación (giro y errores)
 
         # Tiempo absoluto desde inicio de round
         self.start_time = time.perf_counter()
+        self._loop = tempo.loop_index(self.start_time) if tempo else None
+
+        # Registro de inputs del usuario: buffer circular (t perf_counter, nota)
+        self._times = np.zeros(capacity)
+        self._notes = np.zeros(capacity, dtype=np.int64)
+        self._count = 0  # golpes registrados desde el último clear_inputs()
 
-        # Registro de inputs del usuario
-        self.user_inputs = []
+        # Resultado de la última evaluación; se rehace solo si `_dirty`
+        self._result = None
+        self._dirty = False
 
         # Progreso actual (índice del próximo objetivo)
         self.current_index = 0
 
         self.current_state = 0 #Beat Mode
 
-        self.current_notes = []
         self.expected_notes = np.array([63,49,51])
+        self.set_expected(expected_events)
 
     def set_expected(self, expected):
         self.expected = np.array(expected)
+        self._ref_dist = np.diff(self.expected)
+        self._ref_ioi = cyclic_ioi(self.expected, self._span())
+        self._dirty = True
     
     def set_melodie_mode(self):
         self.current_state = 1 #Melodie
+        self.clear_inputs()
 
-    def reset(self):
-        self.start_time = time.perf_counter()
-        self.user_inputs = []
-        self.current_notes = []
+    def clear_inputs(self):
+        """Olvida los golpes registrados (p. ej. al pasar a la siguiente nube)."""
+        self._count = 0
+        self._dirty = True
+
+    def reset(self, start=None):
+        """
+        start: instante (perf_counter) en que empieza el nuevo round; None → ahora.
+        Los golpes no se borran: la ventana sigue deslizándose sobre ellos.
+        """
+        self.start_time = time.perf_counter() if start is None else start
         self.current_index = 0
+        self._dirty = True
 
-    def register_input(self, note=0):
-        """Se llama cuando el usuario presiona la tecla adecuada."""
-        now = time.perf_counter() - self.start_time
-        #print(now)
-        if self.current_state == 1:
-            self.current_notes.append((now,note))
-        else:
-            self.user_inputs.append(now)
+    def register_input(self, note=0, t=None):
+        """
+        Se llama cuando el usuario presiona la tecla adecuada.
+        t: instante del golpe en segundos de time.perf_counter() (p. ej. el
+           timestamp del dispositivo); None → ahora.
+        """
+        i = self._count % len(self._times)
+        self._times[i] = time.perf_counter() if t is None else t
+        self._notes[i] = note
+        self._count += 1
+        self._dirty = True
+
+    def _span(self):
+        return self.tempo.loop_seconds if self.tempo is not None else self.window
 
+    def _recent(self, tolerance):
+        """
+        Golpes (tiempos, notas) del último loop, en orden: los que caen en
+        (ref - loop + tolerancia, ref], con ref el último golpe o el inicio del round.
+        """
+        cap = len(self._times)
+        n = min(self._count, cap)
+        idx = (self._count - n + np.arange(n)) % cap
+        times, notes = self._times[idx], self._notes[idx]
+        ref = max(times[-1], self.start_time) if n else self.start_time
+        keep = times > ref - (self._span() - tolerance)
+        return times[keep], notes[keep]
 
     def update(self):
         """
@@ -59,13 +119,24 @@ class LoopManager:
         now = time.perf_counter()
         elapsed = now - self.start_time
 
+        if self.tempo is not None:
+            if not self.tempo.running:
+                return None  # transporte parado: ni loops nuevos ni evaluación hasta el continue
+            # Loop siguiente según el reloj del dispositivo → reset alineado a su inicio
+            loop = self.tempo.loop_index(now)
+            if loop != self._loop:
+                self._loop = loop
+                self.reset(self.tempo.loop_start(now))
+                return 'reset'
         # Si excedió la ventana total → reset
-        if elapsed > self.window:
+        elif elapsed > self.window:
             self.reset()
             return 'reset'
 
-        
-        return self._compare_vectors(self.user_inputs)
+        if self._dirty:
+            self._result = self._compare_vectors()
+            self._dirty = False
+        return self._result
 
         # Validar si el usuario hizo el evento correcto
         #if self.current_index < len(self.expected):
@@ -83,21 +154,19 @@ class LoopManager:
 
         #return None
 
-    def _equal_rotated(self, a, b):   
-        if len(a) != len(b):
-            return False
-
-        for shift in range(len(a)):
-            if np.array_equal(np.roll(a, shift), b):
-                return True
-        
-        return False
-    
-    def _compare_vectors(self, tolerance=0.2):
+    def _compare_rotated(self, received):
+        """Modo beat con rotation: mismo resultado que _compare_vectors, con el mejor giro."""
+        match = best_rotation(self._ref_ioi, np.diff(received), BEAT_TOLERANCE)
+        self.last_match = match
+        if match.complete:
+            return "next"
+        if match.hits:
+            return "progress"
+        return None
+
+    def _compare_vectors(self):
         """
-        reference: vector de referencia, ej. [0, 0.937, 1.875, 2.812]
-        received: vector a comparar
-        tolerance: margen para coincidencia
+        Compara las distancias entre los golpes recientes con las de la referencia.
 
         Retorna:
             "next"     → todas coinciden
@@ -105,18 +174,13 @@ class LoopManager:
             "trampa"   → Hizo mas de los permitidos
             "none"     → ninguna coincide
         """
-        toleranz = 0
-        received = None
         if self.current_state == 1:
-            toleranz = 0.01
-            #print(self.current_notes)
-            received = np.array([t[0] for t in self.current_notes])
+            toleranz = MELODY_TOLERANCE
         else: 
-            toleranz = 0.12
-            received = np.array(self.user_inputs)
+            toleranz = BEAT_TOLERANCE
+        received, notes = self._recent(toleranz)
 
-        reference = self.expected
-        size = len(reference)
+        size = len(self.expected)
         
         if len(received) < 2:
             return None
@@ -124,23 +188,23 @@ class LoopManager:
         if len(received) > size and self.current_state == 0:
             #print(self.current_state)
             return "trampa"
+
+        if self.rotation and self.current_state == 0:
+            return self._compare_rotated(received)
         
-        # Distancias consecutivas
-        ref_dist = np.diff(reference)
-        rec_dist = np.diff(received)
+        # Distancias consecutivas (las de la referencia, precalculadas)
+        ref_dist = self._ref_dist
+        rec_dist = np.zeros(max(len(ref_dist), len(received) - 1))
+        rec_dist[:len(received) - 1] = np.diff(received)
 
         compara = None
-        if len(rec_dist) < len(ref_dist):
-            rec_dist = np.concatenate([rec_dist, np.full(len(ref_dist) - len(rec_dist), 0)])
-
-        
-        try:
-            comp_vec = np.abs(ref_dist - rec_dist)
-            eval = comp_vec < toleranz
-        except:
+        if len(rec_dist) > len(ref_dist):
             #print(rec_dist)
             eval = [False]
             compara = 'rapido'
+        else:
+            comp_vec = np.abs(ref_dist - rec_dist)
+            eval = comp_vec < toleranz
         
         if self.current_state == 1:
             print(rec_dist[0], ref_dist[0])
@@ -162,7 +226,6 @@ class LoopManager:
             else:
                 print("To end", rec_dist[10])
                 if rec_dist[10] != 0:
-                    notes = np.array([t[1] for t in self.current_notes])
                     #print(notes)
                     if np.all(np.isin(notes, self.expected_notes)):
                         return "end"
@@ -174,4 +237,3 @@ class LoopManager:
                     return compara
                     
             return None
-
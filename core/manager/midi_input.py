@@ -0,0 +1,252 @@
+# midi_input.py
+# Captura de entrada MIDI en un hilo propio, con timestamps del dispositivo.
+# - Un hilo de fondo vacía pygame.midi.Input continuamente (no una vez por frame)
+# - El `ts` de PortMidi (ms, reloj de PortTime) se traduce al reloj del juego
+#   (time.perf_counter, el mismo que usa LoopManager)
+# - Los eventos pasan al bucle principal por una cola circular acotada de un
+#   productor / un consumidor (SPSC)
+# - En cada vuelta el dispositivo se vacía entero (read_all), no N mensajes
+# - Los mensajes realtime (clock 0xF8, start/continue/stop...) no llegan al
+#   despacho del juego: active sensing y sysex se filtran en PortMidi; clock y
+#   transporte se descartan o van a una cola aparte (route_realtime=True)
+#
+# El bucle del juego llama a drain() y recibe (t, status, data1, data2) con
+# `t` ya en segundos de perf_counter: el instante del golpe, no el del frame
+# en el que se procesó.
+#
+# Tras start(), el Input pertenece al hilo: no llamar a poll()/read() desde fuera.
+
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+import pygame.midi
+import pygame.pypm as pypm
+
+QUEUE_CAPACITY = 1024   # eventos pendientes como máximo entre dos drain()
+READ_CHUNK = 64         # eventos por llamada a Input.read()
+POLL_INTERVAL = 0.001   # seg de espera cuando no hay nada que leer
+RESYNC_INTERVAL = 1.0   # seg entre re-estimaciones del offset entre relojes
+SYNC_SAMPLES = 8        # muestras por estimación (se usa la de menor latencia)
+SYNC_SMOOTHING = 0.1    # peso de cada nueva estimación (EMA)
+
+# Clock, start, continue, stop, active sensing, reset (mismo conjunto que sandbox/midi/midi.py)
+REALTIME = frozenset({0xF8, 0xFA, 0xFB, 0xFC, 0xFE, 0xFF})
+SOURCE_FILTER = pypm.FILT_ACTIVE | pypm.FILT_SYSEX  # lo que nunca se quiere, descartado en PortMidi
+REALTIME_FILTER = pypm.FILT_REALTIME                # todo lo realtime (si nadie usa clock/transporte)
+
+MidiEvent = Tuple[float, int, int, int]  # (t perf_counter, status, data1, data2)
+
+
+# Nombres para InputStats.source_filter (FILT_REALTIME incluye varios bits)
+_FILTER_NAMES = (
+    (pypm.FILT_REALTIME, "realtime"),
+    (pypm.FILT_ACTIVE, "active sensing"),
+    (pypm.FILT_SYSEX, "sysex"),
+)
+
+
+def describe_filter(filters: int) -> str:
+    """Máscara de Pm_SetFilter → "active sensing+sysex" ("" si no filtra nada)."""
+    names = []
+    for bits, name in _FILTER_NAMES:
+        if filters & bits == bits:
+            names.append(name)
+            filters &= ~bits
+    if filters:
+        names.append(hex(filters))
+    return "+".join(names)
+
+
+@dataclass
+class InputStats:
+    """
+    Contadores de MidiInputThread. Lo que descarta el filtro de PortMidi
+    (source_filter) no llega a read() y no se cuenta en ninguno: por eso se
+    guarda qué se filtra, para que al imprimir las estadísticas se vea.
+    """
+    seen: int = 0         # mensajes que llegaron a Python
+    dropped: int = 0      # realtime que llegaron a Python y se descartaron (sin route_realtime)
+    realtime: int = 0     # realtime enrutados a su cola
+    overflow: int = 0     # perdidos por cola llena
+    backlog: int = 0      # eventos entregados en el último drain()
+    max_backlog: int = 0
+    source_filter: str = ""  # filtrado ya en PortMidi, sin contar ("" → ninguno)
+
+
+def set_source_filter(midi_in, filters: int) -> bool:
+    """
+    Filtro de PortMidi (Pm_SetFilter): los mensajes filtrados no llegan ni a
+    read(). pygame.midi.Input no lo expone, se usa el stream de pypm que
+    envuelve (o set_filter() en virtual_midi.VirtualInput). Devuelve False si
+    el objeto no lo admite.
+    """
+    if hasattr(midi_in, "set_filter"):
+        midi_in.set_filter(filters)
+        return True
+    stream = getattr(midi_in, "_input", None)
+    if stream is None:
+        return False
+    stream.SetFilter(filters)
+    return True
+
+
+def read_all(midi_in, chunk: int = READ_CHUNK) -> Iterator[Tuple[list, int]]:
+    """Lee ([status, d1, d2, d3], ts) hasta vaciar el buffer del dispositivo."""
+    while midi_in.poll():
+        events = midi_in.read(chunk)
+        if not events:
+            break
+        yield from events
+
+
+class SPSCQueue:
+    """
+    Cola circular de capacidad fija para un productor y un consumidor.
+    Cada índice lo escribe un solo hilo (tail el productor, head el consumidor),
+    así que no hace falta lock. Si está llena, el evento nuevo se descarta y se
+    cuenta en `dropped`.
+    """
+
+    def __init__(self, capacity: int = QUEUE_CAPACITY):
+        self._buf: List[Optional[MidiEvent]] = [None] * (capacity + 1)
+        self._size = capacity + 1
+        self._head = 0  # siguiente a leer (consumidor)
+        self._tail = 0  # siguiente a escribir (productor)
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return (self._tail - self._head) % self._size
+
+    def put(self, item: MidiEvent) -> bool:
+        tail = self._tail
+        nxt = (tail + 1) % self._size
+        if nxt == self._head:
+            self.dropped += 1
+            return False
+        self._buf[tail] = item
+        self._tail = nxt  # publicar después de escribir el slot
+        return True
+
+    def drain(self) -> List[MidiEvent]:
+        head, tail = self._head, self._tail
+        if head == tail:
+            return []
+        if head < tail:
+            items = self._buf[head:tail]
+        else:
+            items = self._buf[head:] + self._buf[:tail]
+        self._head = tail
+        return items
+
+
+class MidiClock:
+    """Traduce timestamps de PortMidi (ms) a segundos de time.perf_counter()."""
+
+    def __init__(self):
+        self.offset = 0.0   # perf_counter - PortTime, en segundos
+        self.synced_at = None
+        self.sync()
+
+    def _estimate(self) -> float:
+        best_rtt, best = None, 0.0
+        for _ in range(SYNC_SAMPLES):
+            t0 = time.perf_counter()
+            ms = pygame.midi.time()
+            t1 = time.perf_counter()
+            if best_rtt is None or t1 - t0 < best_rtt:
+                # PortTime trunca a ms: el instante real está en [ms, ms + 1)
+                best_rtt, best = t1 - t0, (t0 + t1) / 2 - (ms + 0.5) / 1000
+        return best
+
+    def sync(self) -> None:
+        est = self._estimate()
+        if self.synced_at is None:
+            self.offset = est
+        else:
+            self.offset += (est - self.offset) * SYNC_SMOOTHING
+        self.synced_at = time.perf_counter()
+
+    def to_game(self, ts_ms: int) -> float:
+        return ts_ms / 1000 + self.offset
+
+    def to_midi(self, t: float) -> int:
+        """Inverso de to_game: timestamp de PortMidi (ms) para un instante de perf_counter."""
+        return int(round((t - self.offset) * 1000))
+
+
+class MidiInputThread:
+    def __init__(self, midi_in: pygame.midi.Input, capacity: int = QUEUE_CAPACITY,
+                 poll_interval: float = POLL_INTERVAL, route_realtime: bool = False):
+        """
+        midi_in        : entrada ya abierta; tras start() solo la usa este hilo
+        capacity       : tamaño de la cola hacia el bucle del juego
+        poll_interval  : espera entre sondeos cuando no llega nada
+        route_realtime : clock/transporte a una cola propia (drain_realtime) en
+                         vez de descartarlos; sin él se filtran ya en PortMidi
+        """
+        self.midi_in = midi_in
+        self.clock = MidiClock()
+        self.queue = SPSCQueue(capacity)
+        self.realtime = SPSCQueue(capacity) if route_realtime else None
+        self.poll_interval = poll_interval
+        self.stats = InputStats()
+        filters = SOURCE_FILTER if route_realtime else REALTIME_FILTER
+        if set_source_filter(midi_in, filters):
+            self.stats.source_filter = describe_filter(filters)
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MidiInputThread":
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="midi-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        midi_in = self.midi_in
+        clock = self.clock
+        stats = self.stats
+        put = self.queue.put
+        put_rt = self.realtime.put if self.realtime is not None else None
+        while self._running:
+            if time.perf_counter() - clock.synced_at >= RESYNC_INTERVAL:
+                clock.sync()
+            if not midi_in.poll():
+                time.sleep(self.poll_interval)
+                continue
+            captured = time.perf_counter()
+            for data, ts in read_all(midi_in):
+                stats.seen += 1
+                # Sin timestamp del driver (ts == 0) se usa el momento de captura;
+                # un evento nunca puede ser posterior a su lectura
+                t = min(clock.to_game(ts), captured) if ts else captured
+                status = data[0]
+                if status in REALTIME:
+                    if put_rt:
+                        put_rt((t, status, 0, 0))
+                        stats.realtime += 1
+                    else:
+                        stats.dropped += 1
+                    continue
+                put((t, status, data[1], data[2]))
+
+    def drain(self) -> List[MidiEvent]:
+        """Eventos llegados desde el último drain(), en orden, como (t, status, data1, data2)."""
+        items = self.queue.drain()
+        stats = self.stats
+        stats.backlog = len(items)
+        stats.max_backlog = max(stats.max_backlog, stats.backlog)
+        stats.overflow = self.queue.dropped + (self.realtime.dropped if self.realtime is not None else 0)
+        return items
+
+    def drain_realtime(self) -> List[MidiEvent]:
+        """Mensajes realtime (clock, start/continue/stop) como (t, status, 0, 0); [] si no se enrutan."""
+        return self.realtime.drain() if self.realtime is not None else []
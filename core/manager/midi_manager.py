@@ -1,63 +1,174 @@
+import bisect
 import time
+import numpy as np
+from manager.midi_input import MidiClock
 #from graphics_manager import GraphicsManager
 
+# Secuenciador de los patrones completados:
+# - Eventos en arrays ordenados por tiempo + cursor que da la vuelta cada `period`
+# - En cada update() se escriben de una vez (Output.write) los eventos que caen
+#   en la ventana [ahora, ahora + lookahead], con timestamp de PortMidi, así que
+#   suenan en su instante exacto aunque el frame llegue tarde
+# - Hace falta un Output abierto con latency > 0 (si no, PortMidi ignora los
+#   timestamps); con latency_ms=0 se dispara al llegar el momento (resolución de frame)
+# - Los efectos visuales (on_crush_midi) se lanzan cuando el evento suena, no
+#   cuando se programa
+# - Con un TempoTracker la matriz va en tiempos (negras) y cada evento se
+#   programa en tempo.time_at(): sigue el tempo y la fase del reloj MIDI
+#   (con el transporte parado, tempo.running False, no se programa nada)
+#
+# Reloj: time.perf_counter(); MidiClock lo traduce a timestamps de PortMidi.
+
+LOOKAHEAD = 0.1       # seg programados por adelantado (cubre tirones de frame)
+DEDUP_WINDOW = 0.05   # seg: tras reset(), no repetir una nota ya enviada tan cerca
+MAX_WRITE = 1024      # eventos por llamada a Output.write (límite de pygame)
+
+
 class MIDIManager:
-    def __init__(self, patterns_completed, matrix, midi_out, vel=100, channel=0):
+    def __init__(self, patterns_completed, matrix, midi_out, vel=100, channel=0,
+                 period=None, latency_ms=0, lookahead=LOOKAHEAD, tempo=None, clock=None):
         """
         patterns_completed : lista de bools
-        matrix             : diccionario {note: [t1, t2, ...]}
-        midi_out           : objeto con note_on
+        matrix             : diccionario {note: [t1, t2, ...]} en segundos
+                             (en tiempos dentro del loop si se pasa `tempo`)
+        midi_out           : pygame.midi.Output (o compatible, con write())
         vel                : velocidad MIDI
         channel            : canal MIDI
+        period             : duración del loop; None → una sola pasada hasta el próximo reset()
+        latency_ms         : latency con la que se abrió midi_out
+        lookahead          : seg programados por adelantado (se ignora si latency_ms == 0)
+        tempo              : TempoTracker a seguir (sustituye a `period`)
+        clock              : MidiClock compartido (p. ej. el de MidiInputThread);
+                             None → uno propio, re-sincronizado en cada reset()
         """
         self.patterns_completed = patterns_completed
         self.matrix = matrix
         self.midi_out = midi_out
         self.vel = vel
         self.channel = channel
+        self.period = period
+        self.latency_ms = latency_ms
+        self.lookahead = lookahead if latency_ms > 0 else 0.0
+        self.tempo = tempo
+        self._own_clock = clock is None and latency_ms > 0
+        self.clock = MidiClock() if self._own_clock else clock
+        self._last_ts = 0  # último timestamp escrito: PortMidi los exige no decrecientes
 
-        # Lista interna de eventos ya desplegados para no repetirlos
-        self._scheduled = []
+        # Eventos del loop, ordenados por tiempo
+        self._times = np.empty(0)
+        self._notes = np.empty(0, dtype=np.int64)
+        self._cursor = 0
+        self._cycle = 0
+        # Enviados que aún no han sonado: [(t absoluto, nota)] en orden
+        self._pending = []
+        # Enviados en los últimos DEDUP_WINDOW seg (hayan sonado o no), para reset()
+        self._sent = []
         self.start_time = None
         self.graphics = None
+        self.sent = 0
 
     def set_graphics(self, graphics_manager):
         self.graphics = graphics_manager
 
+    def _event_time(self, cycle, x):
+        if self.tempo is not None:
+            return self.tempo.time_at(cycle * self.tempo.beats_per_loop + x)
+        return self.start_time + cycle * (self.period or 0.0) + x
+
     def reset(self):
         """
         Reinicia tiempos y vuelve a evaluar qué patrones deben emitir MIDI.
         """
         self.start_time = time.perf_counter()
-        self._scheduled = []  # limpiar eventos viejos
+        self._cursor = 0
+        self._cycle = 0
+        if self._own_clock:
+            self.clock.sync()
 
         # Por cada patrón completado, programar sus notas
-        i = 0
-        for note, times_list in self.matrix.items():
+        times, notes = [], []
+        for i, (note, times_list) in enumerate(self.matrix.items()):
             if i < len(self.patterns_completed) and self.patterns_completed[i]:
-                for t in times_list:
-                    self._scheduled.append((t, note))
-            i += 1
+                times.extend(times_list)
+                notes.extend([note] * len(times_list))
+
+        # Ordenar eventos por tiempo (estable: mismo orden que la matriz en empates)
+        order = np.argsort(np.asarray(times, dtype=float), kind="stable")
+        self._times = np.asarray(times, dtype=float)[order]
+        self._notes = np.asarray(notes, dtype=np.int64)[order]
+
+        if self.tempo is not None and len(self._times):
+            # Con reloj MIDI el loop no empieza ahora: retomar en la posición actual
+            # (lo ya enviado justo antes del reset lo filtra _was_sent)
+            since = self.start_time - DEDUP_WINDOW
+            self._cycle = self.tempo.loop_index(since)
+            phase = self.tempo.beat(since) - self._cycle * self.tempo.beats_per_loop
+            self._cursor = int(np.searchsorted(self._times, phase))
+            if self._cursor == len(self._times):
+                self._cursor = 0
+                self._cycle += 1
+
+    def _was_sent(self, t, note) -> bool:
+        # Tras un reset() la nota puede estar ya en el buffer de PortMidi o acabar
+        # de sonar (_fire ya la quitó de _pending): _sent guarda ambas
+        return any(n == note and abs(st - t) < DEDUP_WINDOW for st, n in self._sent)
 
-        # Ordenar eventos por tiempo
-        self._scheduled.sort(key=lambda x: x[0])
+    def _schedule(self, now):
+        """Escribe de una vez los eventos que caen en [.., now + lookahead]."""
+        n = len(self._times)
+        one_shot = self.period is None and self.tempo is None
+        if not n or (one_shot and self._cycle):
+            return
+        horizon = now + self.lookahead
+        status = 0x90 | self.channel
+        batch = []
+        while True:
+            t = self._event_time(self._cycle, self._times[self._cursor])
+            if t > horizon:
+                break
+            note = int(self._notes[self._cursor])
+            # Si la fase del reloj saltó hacia delante, lo que quedó atrás no se envía en ráfaga
+            if t >= now - DEDUP_WINDOW and not self._was_sent(t, note):
+                ts = self.clock.to_midi(t) - self.latency_ms if self.clock else 0
+                # Un cambio de tempo o un reset() puede dejar t antes de lo ya enviado
+                ts = self._last_ts = max(ts, self._last_ts)
+                batch.append([[status, note, self.vel], ts])
+                bisect.insort(self._pending, (t, note))
+                bisect.insort(self._sent, (t, note))
+            self._cursor += 1
+            if self._cursor == n:
+                self._cursor = 0
+                self._cycle += 1
+                if one_shot:
+                    break
+
+        for i in range(0, len(batch), MAX_WRITE):
+            self.midi_out.write(batch[i:i + MAX_WRITE])
+        self.sent += len(batch)
+
+    def _fire(self, now):
+        """Efectos visuales de las notas que ya sonaron."""
+        del self._sent[:bisect.bisect_left(self._sent, (now - DEDUP_WINDOW,))]
+        fired = 0
+        for t, _ in self._pending:
+            if t > now:
+                break
+            fired += 1
+        if not fired:
+            return
+        del self._pending[:fired]
+        if self.graphics:
+            for _ in range(fired):
+                self.graphics.on_crush_midi()
 
     def update(self):
         """
-        Chequea si hay notas MIDI que deban dispararse en este frame.
+        Programa las notas que entran en la ventana de lookahead y lanza los
+        efectos de las que ya suenan.
         """
         if self.start_time is None:
             return
-
-        now = time.perf_counter() - self.start_time
-
-        # Los eventos que ya deben dispararse (<= now)
-        to_fire = [ev for ev in self._scheduled if ev[0] <= now]
-
-        for event in to_fire:
-            t, note = event
-            # Disparar note_on
-            self.graphics.on_crush_midi()
-            self.midi_out.note_on(note, self.vel, self.channel)
-            # Removerlo para no repetirlo
-            self._scheduled.remove(event)
+        now = time.perf_counter()
+        if self.tempo is None or self.tempo.running:  # transporte parado: no se programa nada
+            self._schedule(now)
+        self._fire(now)
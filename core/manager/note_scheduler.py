@@ -0,0 +1,98 @@
+# note_scheduler.py
+# Note-offs diferidos sin bloquear el juego (sustituye a note_on + time.sleep + note_off).
+# - play() manda el note_on ya y deja el note_off pendiente en un min-heap
+# - Los note_off vencidos se mandan desde service() (una vez por frame) o
+#   desde un hilo temporizador propio (start()), que duerme hasta el siguiente
+# - Re-disparo: si la misma nota (canal, nota) suena aún, se corta y vuelve a
+#   empezar; el note_off antiguo queda obsoleto (contador de generación) y no
+#   corta la nota nueva
+#
+# Todas las escrituras al puerto pasan por el mismo lock, así que el modo con
+# hilo es seguro siempre que el resto del código no escriba en ese puerto a la
+# vez. Si el puerto se comparte con otro código del hilo principal (main.py),
+# usar service() en el frame loop.
+
+from __future__ import annotations
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class NoteScheduler:
+    def __init__(self, output):
+        """
+        output : objeto con note_on(note, velocity, channel) y
+                 note_off(note, velocity, channel) (pygame.midi.Output o compatible)
+        """
+        self.output = output
+        self._heap: List[Tuple[float, int, int, int, int]] = []  # (deadline, seq, canal, nota, generación)
+        self._gen: Dict[Tuple[int, int], int] = {}                # (canal, nota) sonando → generación vigente
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.retriggers = 0
+
+    def __len__(self) -> int:
+        return len(self._gen)
+
+    # --- alta ---
+    def play(self, note: int, velocity: int, duration: float, channel: int = 0) -> None:
+        """note_on inmediato; note_off `duration` segundos después."""
+        key = (channel, note)
+        with self._cond:
+            if key in self._gen:
+                self.output.note_off(note, 0, channel)
+                self.retriggers += 1
+            gen = self._gen.get(key, 0) + 1
+            self._gen[key] = gen
+            self.output.note_on(note, velocity, channel)
+            heapq.heappush(self._heap, (time.perf_counter() + duration, next(self._seq), channel, note, gen))
+            self._cond.notify()
+
+    # --- note-offs ---
+    def _release_due(self, now: float) -> Optional[float]:
+        """Manda los note_off vencidos (con el lock tomado). Devuelve el próximo deadline."""
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, channel, note, gen = heapq.heappop(heap)
+            if self._gen.get((channel, note)) == gen:
+                del self._gen[(channel, note)]
+                self.output.note_off(note, 0, channel)
+        return heap[0][0] if heap else None
+
+    def service(self, now: Optional[float] = None) -> None:
+        """Para el frame loop: manda los note_off vencidos y vuelve enseguida."""
+        if not self._heap:
+            return
+        with self._cond:
+            self._release_due(time.perf_counter() if now is None else now)
+
+    def flush(self) -> None:
+        """Manda ya todos los note_off pendientes (al salir, antes de cerrar el puerto)."""
+        with self._cond:
+            self._release_due(float("inf"))
+
+    # --- modo hilo ---
+    def start(self) -> "NoteScheduler":
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="note-off", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        with self._cond:
+            while self._running:
+                deadline = self._release_due(time.perf_counter())
+                self._cond.wait(None if deadline is None else max(0.0, deadline - time.perf_counter()))
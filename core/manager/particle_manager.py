@@ -0,0 +1,142 @@
+# particle_manager.py
+# Rayos / notas que caen, guardados en arrays de NumPy de capacidad fija.
+# - Cada slot guarda posición, velocidad, expiración e índice de imagen
+# - update() avanza todas las partículas vivas de una vez (vectorizado)
+# - Los slots libres se reciclan desde una pila (free list)
+# - El tiempo es interno (suma de dt), no se consulta time.time()
+# - Se guarda la posición del paso anterior para interpolar al pintar
+#
+# Política de desbordamiento: con los CAPACITY slots ocupados (o `limit`
+# partículas vivas, si se fijó uno), una nueva partícula reemplaza a la viva
+# que expira antes (la más vieja en la práctica) y se cuenta en `dropped`.
+# Nunca se crece ni se descarta la nueva.
+
+from __future__ import annotations
+from typing import List, Sequence, Tuple
+import numpy as np
+import pygame
+
+CAPACITY = 1024
+
+
+class ParticleManager:
+    def __init__(self, images: Sequence[pygame.Surface], bottom: int, capacity: int = CAPACITY):
+        """
+        images   : imágenes posibles; cada partícula guarda su índice
+        bottom   : y a partir de la cual la partícula muere (alto de pantalla)
+        capacity : número fijo de slots
+        """
+        self.images = list(images)
+        self._index = {id(img): i for i, img in enumerate(self.images)}
+        self._w = np.array([img.get_width() for img in self.images], dtype=np.int32)
+        self._h = np.array([img.get_height() for img in self.images], dtype=np.int32)
+        self.bottom = bottom
+        self.capacity = capacity
+        self.limit = capacity
+
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.prev_x = np.zeros(capacity, dtype=np.float32)
+        self.prev_y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.expiry = np.zeros(capacity, dtype=np.float64)
+        self.img = np.zeros(capacity, dtype=np.int16)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # Pila de slots libres: _free[:_free_top] están disponibles
+        self._free = np.arange(capacity - 1, -1, -1, dtype=np.int32)
+        self._free_top = capacity
+        self._live = np.empty(0, dtype=np.int32)
+
+        self.t = 0.0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def image_index(self, image: pygame.Surface) -> int:
+        return self._index[id(image)]
+
+    def set_limit(self, limit: int | None) -> None:
+        """Máximo de partículas vivas (None → capacidad). Las que sobran mueren ya."""
+        self.limit = self.capacity if limit is None else max(1, min(limit, self.capacity))
+        excess = len(self._live) - self.limit
+        if excess > 0:
+            victims = self._live[np.argsort(self.expiry[self._live], kind="stable")[:excess]]
+            self._kill(victims)
+
+    # --- alta ---
+    def _take_slots(self, n: int) -> np.ndarray:
+        take = max(0, min(n, self._free_top, self.limit - len(self._live)))
+        slots = self._free[self._free_top - take:self._free_top].copy()
+        self._free_top -= take
+        if take < n:
+            # Sin hueco (capacidad o límite): reciclar las vivas que expiran antes
+            live = np.flatnonzero(self.alive)
+            live = live[~np.isin(live, slots)]
+            victims = live[np.argsort(self.expiry[live], kind="stable")[:n - take]]
+            self.dropped += len(victims)
+            slots = np.concatenate([slots, victims.astype(np.int32)])
+        return slots
+
+    def emit(self, img_idx: int, xs, ys, duration: float, vx: float = 0.0, vy: float = 0.0) -> None:
+        """Da de alta varias partículas de golpe; xs es el centro horizontal."""
+        xs = np.atleast_1d(np.asarray(xs, dtype=np.float32))
+        ys = np.broadcast_to(np.asarray(ys, dtype=np.float32), xs.shape)
+        slots = self._take_slots(len(xs))
+        n = len(slots)
+        self.x[slots] = self.prev_x[slots] = xs[:n] - self._w[img_idx] // 2
+        self.y[slots] = self.prev_y[slots] = ys[:n]
+        self.vx[slots] = vx
+        self.vy[slots] = vy
+        self.expiry[slots] = self.t + duration
+        self.img[slots] = img_idx
+        self.alive[slots] = True
+        self._live = np.flatnonzero(self.alive)
+
+    def spawn(self, image: pygame.Surface, x: int, y: int, duration: float, vy: float = 0.0) -> None:
+        self.emit(self.image_index(image), x, y, duration, vy=vy)
+
+    def clear(self) -> None:
+        self.alive[:] = False
+        self._free[:] = np.arange(self.capacity - 1, -1, -1, dtype=np.int32)
+        self._free_top = self.capacity
+        self._live = np.empty(0, dtype=np.int32)
+
+    # --- update ---
+    def update(self, dt: float) -> None:
+        self.t += dt
+        live = self._live
+        if not len(live):
+            return
+        self.prev_x[live] = self.x[live]
+        self.prev_y[live] = self.y[live]
+        self.x[live] += self.vx[live] * dt
+        self.y[live] += self.vy[live] * dt
+        dead = live[(self.expiry[live] <= self.t) | (self.y[live] >= self.bottom)]
+        if len(dead):
+            self._kill(dead)
+
+    def _kill(self, slots: np.ndarray) -> None:
+        self.alive[slots] = False
+        self._free[self._free_top:self._free_top + len(slots)] = slots
+        self._free_top += len(slots)
+        self._live = np.flatnonzero(self.alive)
+
+    # --- draw ---
+    def draw_lists(self, alpha: float = 1.0) -> Tuple[List[tuple], List[pygame.Rect]]:
+        """
+        Posiciones interpoladas (alpha ∈ [0, 1] entre el paso anterior y el actual).
+        Devuelve ([(surface, pos)] listo para Surface.blits(), [rects ocupados]).
+        """
+        live = self._live
+        img = self.img[live]
+        px, py = self.prev_x[live], self.prev_y[live]
+        xs = (px + (self.x[live] - px) * alpha).astype(np.int32).tolist()
+        ys = (py + (self.y[live] - py) * alpha).astype(np.int32).tolist()
+        imgs = self.images
+        blits = [(imgs[i], (x, y)) for i, x, y in zip(img.tolist(), xs, ys)]
+        rects = [pygame.Rect(x, y, w, h)
+                 for x, y, w, h in zip(xs, ys, self._w[img].tolist(), self._h[img].tolist())]
+        return blits, rects
@@ -0,0 +1,142 @@
+# playback_scheduler.py
+# Reproducción MIDI a tiempo, sin deriva, para los reproductores del sandbox
+# (midi_loop.py, midi_cumbia.py, midi_drum.py) y las pistas de acompañamiento.
+# - Cada evento tiene un instante absoluto (origen + t) en time.perf_counter,
+#   que es monotónico; el loop k empieza en origen + k * duración, no "cuando
+#   terminó el anterior", así que el error no se acumula
+# - Espera híbrida: sleep() hasta SPIN_WINDOW antes del instante y espera
+#   activa solo en ese último tramo (no se quema un núcleo entero)
+# - Los note_off son eventos propios en la cola: nada duerme tras un note_on
+# - Se mide el retraso de cada envío (LatenessStats)
+#
+#   player = PlaybackScheduler(midi_out).start()
+#   player.loop([(0.0, 36), (0.5, 38)], 1.0, velocity=110, channel=9)
+
+from __future__ import annotations
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+import numpy as np
+
+SPIN_WINDOW = 0.002   # seg finales de cada espera en espera activa
+NOTE_LENGTH = 0.05    # seg entre note_on y note_off
+PREROLL = 0.05        # seg entre start() y el primer evento
+STATS_WINDOW = 4096   # retrasos recientes que se guardan para percentiles
+
+# Prioridad en empates: el note_off de una nota va antes que su siguiente note_on
+_OFF, _OTHER = 0, 1
+
+
+class LatenessStats:
+    """Retraso de cada envío respecto a su instante programado (seg)."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.count = 0
+        self.max = 0.0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, late: float) -> None:
+        self.count += 1
+        self.total += late
+        self.max = max(self.max, late)
+        self.recent.append(late)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        return float(np.percentile(self.recent, q)) if self.recent else 0.0
+
+    def report(self) -> str:
+        return (f"{self.count} eventos, retraso medio {self.mean * 1000:.3f} ms, "
+                f"p99 {self.percentile(99) * 1000:.3f} ms, máx {self.max * 1000:.3f} ms")
+
+
+class PlaybackScheduler:
+    def __init__(self, output, clock: Callable[[], float] = time.perf_counter,
+                 spin: float = SPIN_WINDOW):
+        """
+        output : pygame.midi.Output (o compatible, con write_short)
+        clock  : reloj monotónico en segundos
+        spin   : seg finales de cada espera en espera activa
+        """
+        self.output = output
+        self.clock = clock
+        self.spin = spin
+        self.origin = None
+        self.stats = LatenessStats()
+        self._queue = []  # (instante absoluto, prioridad, seq, status, data1, data2)
+        self._seq = itertools.count()
+
+    def start(self, origin: Optional[float] = None) -> "PlaybackScheduler":
+        """Fija el origen de tiempos (por defecto: ahora + PREROLL)."""
+        self.origin = self.clock() + PREROLL if origin is None else origin
+        return self
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    # --- programar ---
+    def send_at(self, t: float, status: int, data1: int = 0, data2: int = 0) -> None:
+        """Mensaje en el instante `t` (seg desde el origen)."""
+        is_off = status & 0xF0 == 0x80 or (status & 0xF0 == 0x90 and data2 == 0)
+        heapq.heappush(self._queue, (self.origin + t, _OFF if is_off else _OTHER,
+                                     next(self._seq), status, data1, data2))
+
+    def note(self, t: float, note: int, velocity: int, channel: int = 0,
+             length: float = NOTE_LENGTH) -> None:
+        """note_on en `t` y su note_off en `t + length`, como dos eventos."""
+        self.send_at(t, 0x90 | channel, note, velocity)
+        self.send_at(t + length, 0x80 | channel, note, 0)
+
+    # --- reproducir ---
+    def wait_until(self, deadline: float) -> None:
+        """Duerme hasta `spin` antes de `deadline` y termina en espera activa."""
+        clock = self.clock
+        remaining = deadline - clock()
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+        while clock() < deadline:
+            pass
+
+    def run_until(self, t: float) -> None:
+        """Envía todo lo programado hasta `t` (seg desde el origen) y espera hasta `t`."""
+        end = self.origin + t
+        queue = self._queue
+        while queue and queue[0][0] <= end:
+            deadline, _, _, status, data1, data2 = heapq.heappop(queue)
+            self.wait_until(deadline)
+            self.output.write_short(status, data1, data2)
+            self.stats.add(self.clock() - deadline)
+        self.wait_until(end)
+
+    def flush(self) -> None:
+        """Envía ya lo pendiente (p. ej. note_off al parar), sin esperar."""
+        while self._queue:
+            _, _, _, status, data1, data2 = heapq.heappop(self._queue)
+            self.output.write_short(status, data1, data2)
+
+    def loop(self, pattern: Sequence[Tuple[float, int]], loop_length: float, velocity: int,
+             channel: int = 0, length: float = NOTE_LENGTH, loops: Optional[int] = None,
+             on_loop: Optional[Callable[[int], None]] = None) -> None:
+        """
+        Repite `pattern` ([(t en el loop, nota)]) cada `loop_length` seg,
+        `loops` veces (None → sin fin). `on_loop(k)` se llama al terminar cada vuelta.
+        """
+        for k in (itertools.count() if loops is None else range(loops)):
+            base = k * loop_length
+            for t, note in pattern:
+                self.note(base + t, note, velocity, channel, length)
+            self.run_until(base + loop_length)
+            if on_loop:
+                on_loop(k)
+
+    def play(self, events: Iterable[Tuple[float, Sequence[int]]], offset: float = 0.0) -> None:
+        """Mensajes ya hechos [(t, [status, data1, data2])], en orden de tiempo, desde `offset`."""
+        for t, msg in events:
+            self.send_at(offset + t, *msg[:3])
+            self.run_until(offset + t)
@@ -0,0 +1,76 @@
+# quality_manager.py
+# Gobernador de calidad adaptativo para GraphicsManager.
+# - Observa el tiempo de trabajo de los últimos frames (buffer circular)
+# - Si el p90 se pasa del presupuesto, baja UN nivel de calidad
+# - Si hay holgura sostenida, sube un nivel
+# - Tras cada cambio espera unos frames (cooldown) para no oscilar
+#
+# Los niveles bajan en este orden: render a menor resolución (escalado a
+# pantalla), límite de partículas vivas, sin flash translúcido.
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional, Sequence
+import numpy as np
+
+WINDOW_FRAMES = 60
+DOWN_RATIO = 0.9       # p90 > 90% del presupuesto → bajar
+UP_RATIO = 0.5         # p90 < 50% del presupuesto → subir
+COOLDOWN_DOWN = 60     # frames tras bajar
+COOLDOWN_UP = 180      # frames tras subir (subir es más arriesgado)
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    scale: float = 1.0                   # resolución del render respecto a la pantalla
+    max_particles: Optional[int] = None  # None → capacidad completa
+    flash: bool = True                   # overlay translúcido de tick()
+
+
+QUALITY_TIERS = (
+    QualityTier(),
+    QualityTier(scale=0.75),
+    QualityTier(scale=0.75, max_particles=128),
+    QualityTier(scale=0.75, max_particles=128, flash=False),
+    QualityTier(scale=0.5, max_particles=64, flash=False),
+)
+
+
+class QualityGovernor:
+    def __init__(self, tiers: Sequence[QualityTier] = QUALITY_TIERS, target_fps: float = 60,
+                 window: int = WINDOW_FRAMES):
+        self.tiers = list(tiers)
+        self.budget_ms = 1000.0 / target_fps
+        self.level = 0
+        self._times = np.zeros(window)
+        self._pos = 0
+        self._count = 0
+        self._cooldown = 0
+
+    @property
+    def tier(self) -> QualityTier:
+        return self.tiers[self.level]
+
+    def _set_level(self, level: int, cooldown: int) -> QualityTier:
+        self.level = level
+        self._count = 0
+        self._cooldown = cooldown
+        print(f"[Quality] nivel {level}: {self.tier}")
+        return self.tier
+
+    def observe(self, frame_ms: float) -> Optional[QualityTier]:
+        """Registra el tiempo de trabajo del frame. Devuelve el nuevo nivel si cambia."""
+        self._times[self._pos] = frame_ms
+        self._pos = (self._pos + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+        if self._cooldown:
+            self._cooldown -= 1
+            return None
+        if self._count < len(self._times):
+            return None
+        p90 = np.percentile(self._times, 90)
+        if p90 > self.budget_ms * DOWN_RATIO and self.level < len(self.tiers) - 1:
+            return self._set_level(self.level + 1, COOLDOWN_DOWN)
+        if p90 < self.budget_ms * UP_RATIO and self.level > 0:
+            return self._set_level(self.level - 1, COOLDOWN_UP)
+        return None
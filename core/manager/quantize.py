@@ -0,0 +1,189 @@
+# quantize.py
+# Limpieza de grabaciones de batería para convertirlas en patrones del juego.
+# - Entrada: matriz {nota: [tiempos]} (como la de sandbox/midi/midi_drum.py)
+#   o una grabación (.ubev/.pkl/.mid; se usan los note_on)
+# - Envuelve los golpes en el loop (módulo `period`), une dobles disparos
+#   (golpes de la misma nota a menos de `merge` seg) y los ajusta a una
+#   rejilla de `steps` pasos por loop, con swing y fuerza
+# - Salida: matriz {nota: [tiempos]} ordenada, lista para
+#   GraphicsManager.set_timeline_from_matrix / MIDIManager / PatternBank
+#   (to_beats() la pasa de segundos a tiempos)
+# - quantize_batch() hace todas las grabaciones de una vez: se concatenan en
+#   un solo array con un id de grupo (fichero, nota) y se procesan juntas
+#
+#   cd core && python -m manager.quantize grabaciones/ --period 3.75 --steps 16 --bpm 64
+#
+# Todos los tiempos en la unidad de la entrada (seg en las grabaciones).
+
+from __future__ import annotations
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from manager.event_file import load_any
+
+MERGE_WINDOW = 0.03   # seg: dos golpes de la misma nota más juntos son un rebote del pad
+DECIMALS = 4          # redondeo de la matriz de salida
+EPS = 1e-6            # golpes que caen en el mismo punto de la rejilla
+RECORDING_SUFFIXES = (".ubev", ".pkl", ".mid", ".midi", ".json")
+
+Matrix = Dict[int, List[float]]
+
+
+def matrix_from_events(times, msgs, channel=None) -> Matrix:
+    """{nota: [tiempos de note_on]} de una grabación (channel=None → todos los canales)."""
+    msgs = np.asarray(msgs).reshape(-1, 3)
+    times = np.asarray(times, dtype=float)
+    on = (msgs[:, 0] & 0xF0 == 0x90) & (msgs[:, 2] > 0)
+    if channel is not None:
+        on &= msgs[:, 0] & 0x0F == channel
+    notes = msgs[on, 1].astype(int)
+    order = sorted(set(notes.tolist()), key=notes.tolist().index)  # orden de aparición
+    return {note: times[on][notes == note].tolist() for note in order}
+
+
+def load_matrix(path) -> Matrix:
+    """Grabación (.ubev/.pkl/.mid) o matriz guardada en JSON ({"nota": [tiempos]})."""
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        return {int(k): list(map(float, v)) for k, v in json.loads(path.read_text()).items()}
+    return matrix_from_events(*load_any(path))
+
+
+def to_beats(matrix: Matrix, bpm: float, decimals: int = DECIMALS) -> Matrix:
+    """Segundos → tiempos (negras) a `bpm`, para PatternBank."""
+    return {note: [round(t * bpm / 60.0, decimals) for t in times] for note, times in matrix.items()}
+
+
+# ---------------------------------------------------------------------
+# Núcleo vectorizado: t (golpes) + group (id de fichero/nota)
+# ---------------------------------------------------------------------
+def _merge(t: np.ndarray, group: np.ndarray, window: float, period: float) -> np.ndarray:
+    """
+    Máscara de golpes a conservar: dentro de cada grupo, se descarta el que
+    llega a menos de `window` del anterior (también del último del loop al primero).
+    """
+    n = len(t)
+    keep = np.ones(n, dtype=bool)
+    if not n:
+        return keep
+    same = group[1:] == group[:-1]
+    keep[1:] = ~(same & (np.diff(t) < window))
+    starts = np.flatnonzero(np.r_[True, ~same])
+    ends = np.r_[starts[1:], n] - 1
+    wrap = (ends > starts) & (t[starts] + period - t[ends] < window)
+    keep[starts[wrap]] = False
+    return keep
+
+
+def _snap(t: np.ndarray, period: float, steps: int, swing: float, strength: float) -> np.ndarray:
+    """
+    Acerca cada golpe al punto de rejilla más próximo. Con swing, el segundo
+    paso de cada par se retrasa swing * paso (1/3 → tresillo).
+    """
+    step = period / steps
+    pair = 2 * step
+    k = np.floor(t / pair)
+    points = np.array([0.0, step * (1 + swing), pair])
+    rem = t - k * pair
+    q = k * pair + points[np.argmin(np.abs(rem[:, None] - points), axis=1)]
+    return np.mod(t + strength * (q - t), period)
+
+
+def _process(t, group, period, steps, swing, strength, merge, origin) -> Tuple[np.ndarray, np.ndarray]:
+    t = np.mod(np.asarray(t, dtype=float) - origin, period)
+    order = np.lexsort((t, group))
+    t, group = t[order], group[order]
+    keep = _merge(t, group, merge, period)
+    t, group = t[keep], group[keep]
+    if steps:
+        t = _snap(t, period, steps, swing, strength)
+        order = np.lexsort((t, group))
+        t, group = t[order], group[order]
+        keep = _merge(t, group, EPS, period)
+        t, group = t[keep], group[keep]
+    return t, group
+
+
+# ---------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------
+def quantize_batch(matrices: Sequence[Matrix], period: float, steps: int = 16, swing: float = 0.0,
+                   strength: float = 1.0, merge: float = MERGE_WINDOW, origin: float = 0.0,
+                   decimals: int = DECIMALS) -> List[Matrix]:
+    """
+    Cuantiza varias matrices en una sola pasada.
+    period   : duración del loop (los golpes se envuelven en [0, period))
+    steps    : pasos de rejilla por loop (0 → sin cuantizar; par si hay swing)
+    swing    : retraso del paso débil de cada par, en fracción de paso
+    strength : 0..1, cuánto se acerca cada golpe a la rejilla
+    merge    : golpes de la misma nota más juntos que esto se unen (se queda el primero)
+    origin   : instante de la grabación que es el principio del loop
+    """
+    notes = [list(m) for m in matrices]
+    group, t = [], []
+    for fi, m in enumerate(matrices):
+        for ni, note in enumerate(notes[fi]):
+            onsets = m[note]
+            t.extend(onsets)
+            group.extend([(fi << 8) | ni] * len(onsets))
+    t, group = _process(np.asarray(t, dtype=float), np.asarray(group, dtype=np.int64),
+                        period, steps, swing, strength, merge, origin)
+    t = np.round(t, decimals)
+
+    out: List[Matrix] = [{note: [] for note in n} for n in notes]
+    bounds = np.flatnonzero(np.r_[True, group[1:] != group[:-1], True]) if len(t) else []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        fi, ni = int(group[a]) >> 8, int(group[a]) & 0xFF
+        out[fi][notes[fi][ni]] = t[a:b].tolist()
+    return out
+
+
+def quantize_matrix(matrix: Matrix, period: float, steps: int = 16, **kwargs) -> Matrix:
+    """Una sola matriz (ver quantize_batch)."""
+    return quantize_batch([matrix], period, steps, **kwargs)[0]
+
+
+def quantize_files(paths, period: float, steps: int = 16, **kwargs) -> Dict[Path, Matrix]:
+    """Grabaciones y/o directorios de grabaciones → {fichero: matriz}."""
+    files: List[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            files.extend(sorted(f for f in p.iterdir() if f.suffix.lower() in RECORDING_SUFFIXES))
+        else:
+            files.append(p)
+    results = quantize_batch([load_matrix(f) for f in files], period, steps, **kwargs)
+    return dict(zip(files, results))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cuantizar grabaciones de batería a matrices del juego")
+    ap.add_argument("paths", nargs="+", help="grabaciones (.ubev/.pkl/.mid/.json) o directorios")
+    ap.add_argument("--period", type=float, required=True, help="duración del loop en seg")
+    ap.add_argument("--steps", type=int, default=16, help="pasos de rejilla por loop (0: sin rejilla)")
+    ap.add_argument("--swing", type=float, default=0.0)
+    ap.add_argument("--strength", type=float, default=1.0)
+    ap.add_argument("--merge", type=float, default=MERGE_WINDOW, help="ventana de dobles disparos en seg")
+    ap.add_argument("--origin", type=float, default=0.0, help="inicio del loop en la grabación (seg)")
+    ap.add_argument("--bpm", type=float, help="salida en tiempos (negras) a este tempo, para PatternBank")
+    ap.add_argument("--out", help="directorio donde guardar cada matriz como JSON")
+    args = ap.parse_args(argv)
+
+    # Con --bpm se redondea después de pasar a tiempos, no antes
+    results = quantize_files(args.paths, args.period, args.steps, swing=args.swing,
+                             strength=args.strength, merge=args.merge, origin=args.origin,
+                             decimals=9 if args.bpm else DECIMALS)
+    for path, matrix in results.items():
+        if args.bpm:
+            matrix = to_beats(matrix, args.bpm)
+        print(f"# {path}")
+        print("{" + ",\n ".join(f"{note}: {times}" for note, times in matrix.items()) + "}")
+        if args.out:
+            dst = Path(args.out) / (path.stem + ".json")
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            dst.write_text(json.dumps({str(k): v for k, v in matrix.items()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# recorder.py
+# Grabación MIDI en streaming a disco, con memoria acotada y a prueba de cortes.
+# - record() (bucle de captura) solo copia el evento a un buffer circular
+#   preasignado (arrays de numpy); nunca toca el disco
+# - Un hilo escritor vacía el buffer por trozos a un .ubev (manager/event_file)
+#   en modo append, con flush + fsync en cada trozo
+# - Los mensajes realtime (clock 0xF8, start/stop, active sensing...) se
+#   descartan al capturar, no al guardar
+# - Si el proceso muere, el fichero tiene todo lo escrito hasta el último
+#   trozo; `python core/manager/event_file.py recover f.ubev` quita el final a medias
+#
+# Un productor (captura) y un consumidor (escritor): cada índice del buffer
+# lo escribe un solo hilo, como midi_input.SPSCQueue.
+
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from manager.event_file import DEFAULT_UNIT_US, EventWriter
+from manager.midi_input import REALTIME
+
+RING_CAPACITY = 65536   # eventos en memoria como máximo (~1 MB)
+CHUNK_EVENTS = 1024     # eventos por escritura
+FLUSH_INTERVAL = 0.25   # seg: como mucho este tiempo en memoria antes de ir a disco
+
+
+@dataclass
+class RecorderStats:
+    recorded: int = 0   # eventos aceptados en el buffer
+    filtered: int = 0   # realtime descartados al capturar
+    overflow: int = 0   # perdidos por buffer lleno (el disco no da abasto)
+    written: int = 0    # eventos ya en disco
+    chunks: int = 0     # escrituras hechas
+
+
+class StreamingRecorder:
+    def __init__(self, path, capacity: int = RING_CAPACITY, chunk: int = CHUNK_EVENTS,
+                 flush_interval: float = FLUSH_INTERVAL, delta: bool = False,
+                 unit_us: int = DEFAULT_UNIT_US, append: bool = False, sync: bool = True):
+        """
+        path           : .ubev de destino
+        capacity       : eventos en el buffer circular
+        chunk          : eventos por escritura
+        flush_interval : seg máximos entre escrituras (aunque el trozo no esté lleno)
+        delta          : registros delta (ver event_file)
+        append         : seguir un fichero existente en vez de empezar de cero
+        sync           : fsync tras cada escritura (sobrevive también a un corte de luz)
+        """
+        self.path = Path(path)
+        if not append and self.path.exists():
+            self.path.unlink()
+        self.writer = EventWriter(self.path, delta=delta, unit_us=unit_us)
+        self.chunk = chunk
+        self.flush_interval = flush_interval
+        self.sync = sync
+        self.stats = RecorderStats()
+
+        self._times = np.zeros(capacity + 1)
+        self._msgs = np.zeros((capacity + 1, 3), dtype=np.uint8)
+        self._size = capacity + 1
+        self._head = 0   # siguiente a escribir en disco (hilo escritor)
+        self._tail = 0   # siguiente hueco libre (captura)
+        self._last_t = self.writer.last_time
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        """Eventos en memoria pendientes de escribir."""
+        return (self._tail - self._head) % self._size
+
+    def start(self) -> "StreamingRecorder":
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="midi-rec", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Para el hilo, escribe lo que quede y cierra el fichero."""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._write(len(self))
+        self.writer.close()
+
+    # --- captura ---
+    def record(self, t: float, status: int, data1: int = 0, data2: int = 0) -> bool:
+        """Evento en `t` (seg desde el inicio de la grabación). False si no se guardó."""
+        if status in REALTIME:
+            self.stats.filtered += 1
+            return False
+        tail = self._tail
+        nxt = (tail + 1) % self._size
+        if nxt == self._head:
+            self.stats.overflow += 1
+            return False
+        # Tiempos no decrecientes (el formato lo exige)
+        t = self._last_t = max(t, self._last_t)
+        self._times[tail] = t
+        self._msgs[tail] = (status, data1, data2)
+        self._tail = nxt  # publicar después de escribir el slot
+        self.stats.recorded += 1
+        return True
+
+    # --- escritura ---
+    def _write(self, n: int) -> None:
+        if not n:
+            return
+        head = self._head
+        while n:
+            end = min(head + n, self._size)  # hasta el final del array; lo demás en la siguiente vuelta
+            self.writer.append(self._times[head:end], self._msgs[head:end])
+            n -= end - head
+            self.stats.written += end - head
+            head = end % self._size
+        self._head = head
+        self.writer.flush(sync=self.sync)
+        self.stats.chunks += 1
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while self._running:
+            pending = len(self)
+            now = time.perf_counter()
+            if pending >= self.chunk or (pending and now - last >= self.flush_interval):
+                self._write(min(pending, self.chunk))
+                last = now
+            else:
+                time.sleep(min(self.flush_interval, 0.01))
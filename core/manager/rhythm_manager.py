@@ -5,19 +5,107 @@
 # - Los valores de rhythm_matrix son 0/1 (no hay evento / hay evento)
 # - Se guardan predicciones del usuario por loop y por nube
 # - Al completar todos los treffers de un loop para la nube activa, se marca como "mastered"
+# - Esperados y predicciones se emparejan uno a uno en el anillo del loop de
+#   forma óptima (rhythm_match.match_steps, barrido de dos punteros);
+#   evaluate_all() evalúa todas las nubes y todos los loops grabados en una
+#   sola llamada (rhythm_match.ring_metrics)
+# - Patrones, predicciones y aciertos son bitmasks (int: bit i = paso i, de
+#   cualquier ancho); los aciertos se cuentan con popcount
+# - Solo se guardan los últimos `history` loops de cada nube (anillo fijo):
+#   la memoria no crece en una sesión larga; cloud_status los decodifica al pedirlo
 
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Set
+import numpy as np
+from manager.rhythm_match import match_steps, ring_metrics
+
+HISTORY_LOOPS = 64  # loops recordados por nube
+
+
+def steps_to_bits(steps) -> int:
+    bits = 0
+    for s in steps:
+        bits |= 1 << s
+    return bits
+
+
+def bits_to_steps(bits: int) -> List[int]:
+    steps = []
+    while bits:
+        low = bits & -bits
+        steps.append(low.bit_length() - 1)
+        bits ^= low
+    return steps
+
+
+def bits_to_masks(bits: List[int], steps: int) -> np.ndarray:
+    """Bitmasks → matriz (len(bits), steps) de bool."""
+    nbytes = (steps + 7) // 8
+    raw = np.frombuffer(b"".join(b.to_bytes(nbytes, "little") for b in bits), dtype=np.uint8)
+    return np.unpackbits(raw.reshape(len(bits), nbytes), axis=1, bitorder="little")[:, :steps].astype(bool)
+
+
+def mask_to_bits(mask) -> int:
+    return int.from_bytes(np.packbits(np.asarray(mask, dtype=bool), bitorder="little").tobytes(), "little")
 
 
 @dataclass
 class CloudProgress:
-    # Por loop index -> conjunto de pasos predichos por el usuario (enteros)
-    predictions_by_loop: Dict[int, Set[int]] = field(default_factory=dict)
-    # Por loop index -> pasos acertados (match con tolerancia)
-    hits_by_loop: Dict[int, Set[int]] = field(default_factory=dict)
+    # Anillo de los últimos `history` loops: ranura = loop % history
+    history: int = HISTORY_LOOPS
     mastered: bool = False
+    loop_ids: List[Optional[int]] = field(init=False)    # loop guardado en cada ranura (None = vacía)
+    pred_bits: List[int] = field(init=False)             # pasos predichos por el usuario
+    hit_bits: List[Optional[int]] = field(init=False)    # pasos acertados (None = sin evaluar)
+
+    def __post_init__(self) -> None:
+        self.loop_ids = [None] * self.history
+        self.pred_bits = [0] * self.history
+        self.hit_bits = [None] * self.history
+
+    def _slot(self, loop_idx: int, create: bool = False) -> Optional[int]:
+        slot = loop_idx % self.history
+        if self.loop_ids[slot] != loop_idx:
+            if not create:
+                return None
+            # Se reutiliza la ranura del loop más antiguo
+            self.loop_ids[slot] = loop_idx
+            self.pred_bits[slot] = 0
+            self.hit_bits[slot] = None
+        return slot
+
+    def add_prediction(self, loop_idx: int, step: int) -> None:
+        self.pred_bits[self._slot(loop_idx, create=True)] |= 1 << step
+
+    def predictions(self, loop_idx: int) -> int:
+        slot = self._slot(loop_idx)
+        return 0 if slot is None else self.pred_bits[slot]
+
+    def set_hits(self, loop_idx: int, bits: int) -> None:
+        self.hit_bits[self._slot(loop_idx, create=True)] = bits
+
+    def _stored_loops(self) -> List[int]:
+        """Loops con ranura (con predicciones o solo evaluados)."""
+        return sorted(l for l in self.loop_ids if l is not None)
+
+    def recorded_loops(self) -> List[int]:
+        """Loops con alguna predicción registrada (las claves de predictions_by_loop)."""
+        return sorted(l for l, bits in zip(self.loop_ids, self.pred_bits) if l is not None and bits)
+
+    # Vistas como antes ({loop: set de pasos}), decodificadas al pedirlas
+    @property
+    def predictions_by_loop(self) -> Dict[int, Set[int]]:
+        return {l: set(bits_to_steps(self.predictions(l))) for l in self.recorded_loops()}
+
+    @property
+    def hits_by_loop(self) -> Dict[int, Set[int]]:
+        out = {}
+        for l in self._stored_loops():
+            bits = self.hit_bits[self._slot(l)]
+            if bits is not None:
+                out[l] = set(bits_to_steps(bits))
+        return out
 
 
 class RhythmManager:
@@ -26,6 +114,7 @@ class RhythmManager:
         rhythm_matrix: List[List[int]],  # clouds x steps (0/1)
         steps_per_loop: int,
         tolerance_steps: int = 0,  # tolerancia en pasos para el treffer (0 = exacto)
+        history: int = HISTORY_LOOPS,  # loops recordados por nube
     ) -> None:
         assert steps_per_loop > 0, "steps_per_loop debe ser > 0"
         self.rhythm_matrix = rhythm_matrix
@@ -33,9 +122,13 @@ class RhythmManager:
         self.tolerance_steps = tolerance_steps
         self.num_clouds = len(rhythm_matrix)
         self._validate_matrix()
+        self._rows = np.asarray(rhythm_matrix) == 1  # clouds x steps (bool)
+        self._row_bits = [mask_to_bits(row) for row in self._rows]
+        self._expected_steps = [bits_to_steps(bits) for bits in self._row_bits]
+        self.history = history
 
         # Progreso por nube (índice)
-        self.progress: List[CloudProgress] = [CloudProgress() for _ in range(self.num_clouds)]
+        self.progress: List[CloudProgress] = [CloudProgress(history) for _ in range(self.num_clouds)]
         # Nube actualmente seleccionada
         self.current_cloud: int = 0
 
@@ -54,12 +147,6 @@ class RhythmManager:
             if len(row) != cols:
                 raise ValueError("Todas las filas de rhythm_matrix deben tener el mismo número de columnas")
 
-    def _wrap_distance(self, a: int, b: int) -> int:
-        """Distancia mínima en el anillo [0..steps_per_loop-1] entre dos pasos."""
-        n = self.steps_per_loop
-        d = abs(a - b) % n
-        return min(d, n - d)
-
     # -------------------------------
     # API pública
     # -------------------------------
@@ -78,8 +165,11 @@ class RhythmManager:
         return all(p.mastered for p in self.progress)
 
     def expected_steps_for_cloud(self, cloud_idx: int) -> List[int]:
-        row = self.rhythm_matrix[cloud_idx]
-        return [i for i, v in enumerate(row) if v == 1]
+        """Pasos del patrón (lista precalculada: no modificarla)."""
+        return self._expected_steps[cloud_idx]
+
+    def is_expected_step(self, cloud_idx: int, step_idx: int) -> bool:
+        return bool(self._row_bits[cloud_idx] >> step_idx & 1)
 
     def register_prediction(self, loop_idx: int, cloud_idx: Optional[int], step_idx: int) -> None:
         """Registra una predicción del usuario en el loop y nube dados."""
@@ -90,7 +180,7 @@ class RhythmManager:
         step_idx = step_idx % self.steps_per_loop
 
         prog = self.progress[cloud_idx]
-        prog.predictions_by_loop.setdefault(loop_idx, set()).add(step_idx)
+        prog.add_prediction(loop_idx, step_idx)
 
     def evaluate_loop_for_cloud(self, loop_idx: int, cloud_idx: Optional[int] = None) -> Dict[str, int]:
         """Compara predicciones vs patrón con tolerancia. Marca mastered si se cumplen todas.
@@ -98,31 +188,19 @@ class RhythmManager:
         if cloud_idx is None:
             cloud_idx = self.current_cloud
 
-        expected = self.expected_steps_for_cloud(cloud_idx)
         prog = self.progress[cloud_idx]
-        predicted = list(prog.predictions_by_loop.get(loop_idx, set()))
-        tol = self.tolerance_steps
-
-        hits: Set[int] = set()  # pasos del patrón que se considerarán acertados
-        used_preds: Set[int] = set()
-
-        for s in expected:
-            # buscar alguna predicción p cercana
-            found = False
-            for p in predicted:
-                if p in used_preds:
-                    continue
-                if self._wrap_distance(p, s) <= tol:
-                    hits.add(s)
-                    used_preds.add(p)
-                    found = True
-                    break
-            # si no se encontró, sigue al siguiente esperado
-
-        prog.hits_by_loop[loop_idx] = hits
-
-        total_expected = len(expected)
-        total_hits = len(hits)
+        expected = self._row_bits[cloud_idx]
+        predicted = prog.predictions(loop_idx)
+        if self.tolerance_steps <= 0:
+            hits = expected & predicted  # pasos del patrón acertados
+        else:
+            hits = steps_to_bits(match_steps(self._expected_steps[cloud_idx], bits_to_steps(predicted),
+                                             self.steps_per_loop, self.tolerance_steps))
+
+        prog.set_hits(loop_idx, hits)
+
+        total_expected = expected.bit_count()
+        total_hits = hits.bit_count()
         missed = total_expected - total_hits
 
         if missed == 0 and total_expected > 0:
@@ -134,13 +212,30 @@ class RhythmManager:
             "missed": missed,
         }
 
+    def evaluate_all(self) -> Dict[str, np.ndarray]:
+        """
+        Evalúa todas las nubes en todos sus loops grabados de una vez, sin
+        tocar el progreso. Devuelve arrays alineados: cloud, loop,
+        total_expected, total_hits, missed.
+        """
+        clouds, loops, preds = [], [], []
+        for c, prog in enumerate(self.progress):
+            for loop_idx in prog.recorded_loops():
+                clouds.append(c)
+                loops.append(loop_idx)
+                preds.append(prog.predictions(loop_idx))
+        clouds = np.asarray(clouds, dtype=np.int64)
+        predicted = bits_to_masks(preds, self.steps_per_loop)
+        metrics = ring_metrics(self._rows[clouds], predicted, self.tolerance_steps)
+        return {"cloud": clouds, "loop": np.asarray(loops, dtype=np.int64), **metrics}
+
     def reset_predictions_for_cloud(self, cloud_idx: int) -> None:
-        self.progress[cloud_idx] = CloudProgress(mastered=self.progress[cloud_idx].mastered)
+        self.progress[cloud_idx] = CloudProgress(self.history, mastered=self.progress[cloud_idx].mastered)
 
     def cloud_status(self, cloud_idx: int) -> Dict[str, object]:
         prog = self.progress[cloud_idx]
         return {
             "mastered": prog.mastered,
-            "loops_recorded": list(prog.predictions_by_loop.keys()),
+            "loops_recorded": prog.recorded_loops(),
             "hits_by_loop": {k: sorted(list(v)) for k, v in prog.hits_by_loop.items()},
         }
@@ -0,0 +1,180 @@
+# rhythm_match.py
+# Comparación de ritmos en el anillo del loop (el patrón se repite, así que
+# empezar en otro tiempo del compás sigue siendo el mismo ritmo).
+# - Un patrón de n golpes en un loop de duración P tiene n intervalos cíclicos
+#   (IOI): las distancias entre golpes consecutivos más el salto del último
+#   al primero del loop siguiente; suman P
+# - Lo tocado (k+1 golpes → k intervalos) se compara con las n ventanas
+#   cíclicas de k intervalos de la referencia a la vez: correlación cruzada
+#   circular por FFT, O(n log n) en vez de probar cada giro (O(n²))
+#
+#   ref = cyclic_ioi([0, 0.9375, 1.875, 2.8125], 3.75)
+#   m = best_rotation(ref, np.diff(golpes), tolerance=0.12)
+#   m.shift, m.interval_error, m.onset_error, m.complete
+#
+# Para pasos de rejilla (RhythmManager), match_steps() empareja esperados y
+# predichos uno a uno en el anillo con un barrido de dos punteros.
+
+from __future__ import annotations
+import bisect
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+
+
+@dataclass
+class RotationMatch:
+    shift: int                  # golpe de la referencia por el que empezó el jugador
+    interval_error: np.ndarray  # tocado - referencia, por intervalo (seg)
+    onset_error: np.ndarray     # desvío acumulado de cada golpe respecto al primero (seg)
+    hits: int                   # intervalos dentro de la tolerancia
+    complete: bool              # todos los de un loop entero dentro de la tolerancia
+
+
+def cyclic_ioi(onsets, period: float) -> np.ndarray:
+    """Intervalos entre golpes consecutivos de un loop, incluido el cierre (último → primero + period)."""
+    onsets = np.sort(np.asarray(onsets, dtype=float))
+    if not len(onsets):
+        return np.empty(0)
+    return np.diff(np.r_[onsets, onsets[0] + period])
+
+
+def rotation_errors(ref_ioi: np.ndarray, rec_ioi: np.ndarray) -> np.ndarray:
+    """
+    Error cuadrático de `rec_ioi` (k ≤ n intervalos) contra cada ventana
+    cíclica de `ref_ioi` (n): sse[s] = Σ_i (ref[(s + i) % n] - rec[i])².
+    """
+    ref = np.asarray(ref_ioi, dtype=float)
+    rec = np.asarray(rec_ioi, dtype=float)
+    n, k = len(ref), len(rec)
+    if k > n:
+        raise ValueError("más intervalos tocados que en la referencia")
+    # Σ ref·rec para todos los giros a la vez: corr[s] = Σ_i ref[s + i] rec[i]
+    corr = np.fft.irfft(np.fft.rfft(ref) * np.conj(np.fft.rfft(rec, n)), n)
+    # Σ ref² de cada ventana cíclica de k intervalos
+    sq = np.cumsum(np.r_[0.0, ref * ref, ref * ref])
+    window = sq[np.arange(n) + k] - sq[:n]
+    return np.maximum(window + rec @ rec - 2 * corr, 0.0)
+
+
+def best_rotation(ref_ioi, rec_ioi, tolerance: float) -> RotationMatch:
+    """Giro de la referencia que mejor explica los intervalos tocados."""
+    ref = np.asarray(ref_ioi, dtype=float)
+    rec = np.asarray(rec_ioi, dtype=float)
+    n, k = len(ref), len(rec)
+    shift = int(np.argmin(rotation_errors(ref, rec)))
+    aligned = ref[(shift + np.arange(k)) % n]
+    interval_error = rec - aligned
+    onset_error = np.r_[0.0, np.cumsum(interval_error)]
+    ok = np.abs(interval_error) < tolerance
+    return RotationMatch(
+        shift=shift,
+        interval_error=interval_error,
+        onset_error=onset_error,
+        hits=int(ok.sum()),
+        complete=k >= n - 1 and bool(ok.all()),
+    )
+
+
+# ---------------------------------------------------------------------
+# Pasos de rejilla: emparejamiento uno a uno en el anillo
+# ---------------------------------------------------------------------
+def match_steps(expected, predicted, n: int, tolerance: int) -> List[int]:
+    """
+    Emparejamiento máximo uno a uno entre pasos esperados y predichos de un
+    loop de n pasos, con distancia cíclica ≤ tolerance. expected/predicted:
+    pasos sin repetir en [0, n); devuelve los esperados acertados, ordenados.
+
+    En una recta es óptimo barrer las predicciones en orden con dos punteros
+    y dar cada una al primer esperado libre de su ventana. En el anillo el
+    barrido sigue vuelta tras vuelta (el patrón se repite) hasta que el
+    puntero empieza una vuelta en el mismo sitio que la anterior: esa vuelta
+    es un emparejamiento cíclico válido y máximo. Suele bastar con 2-3
+    vueltas: O((E + P) log) por loop, contando la ordenación.
+    """
+    e, p = sorted(expected), sorted(predicted)
+    ne, npred = len(e), len(p)
+    if not ne or not npred:
+        return []
+    if tolerance <= 0:
+        return sorted(set(e).intersection(p))
+    if 2 * tolerance + 1 >= n:
+        # Todas las ventanas cubren el anillo entero: aciertan min(E, P) cualesquiera
+        return e[:min(ne, npred)]
+
+    # Próximo esperado libre de la secuencia desenrollada: e[r] + off
+    # (off = n * vueltas); se empieza sin nada consumido
+    lo = p[0] - tolerance
+    r = bisect.bisect_left(e, lo % n)
+    off = (lo // n) * n
+    if r == ne:
+        r, off = 0, off + n
+    lap = 0
+    while True:
+        start = (r, off - lap * n)
+        used = []
+        base = lap * n
+        for v in p:
+            v += base
+            while e[r] + off < v - tolerance:  # esperados que ya nadie puede alcanzar
+                r += 1
+                if r == ne:
+                    r, off = 0, off + n
+            if e[r] + off <= v + tolerance:
+                used.append(e[r])
+                r += 1
+                if r == ne:
+                    r, off = 0, off + n
+        lap += 1
+        # Misma posición relativa al empezar la vuelta siguiente → punto fijo
+        if (r, off - lap * n) == start or lap > ne + 1:
+            return sorted(used)
+
+
+def ring_match(expected, predicted, tolerance: int) -> np.ndarray:
+    """
+    match_steps sobre máscaras (..., N) de bool; devuelve la máscara (..., N)
+    de esperados acertados. Con varias filas se hace fila a fila.
+    """
+    exp = np.asarray(expected, dtype=bool)
+    pred = np.asarray(predicted, dtype=bool)
+    n = exp.shape[-1]
+    if tolerance <= 0:
+        return exp & pred
+    e2 = exp.reshape(-1, n)
+    p2 = pred.reshape(-1, n)
+    out = np.zeros_like(e2)
+    for row, (e, p) in enumerate(zip(e2, p2)):
+        out[row, match_steps(np.flatnonzero(e).tolist(), np.flatnonzero(p).tolist(), n, tolerance)] = True
+    return out.reshape(exp.shape)
+
+
+def ring_metrics(expected, predicted, tolerance: int) -> dict:
+    """
+    Métricas de ring_match por lote: total_expected, total_hits, missed (arrays).
+    Los pasos de todas las filas se extraen de una vez (np.nonzero); solo el
+    barrido va fila a fila.
+    """
+    exp = np.asarray(expected, dtype=bool)
+    pred = np.asarray(predicted, dtype=bool)
+    n = exp.shape[-1]
+    e2 = exp.reshape(-1, n)
+    p2 = pred.reshape(-1, n)
+    total_expected = e2.sum(-1)
+    if tolerance <= 0:
+        total_hits = (e2 & p2).sum(-1)
+    else:
+        rows = len(e2)
+        e_rows, e_steps = np.nonzero(e2)
+        p_rows, p_steps = np.nonzero(p2)
+        e_split = np.split(e_steps, np.searchsorted(e_rows, np.arange(1, rows)))
+        p_split = np.split(p_steps, np.searchsorted(p_rows, np.arange(1, rows)))
+        total_hits = np.fromiter((len(match_steps(e.tolist(), p.tolist(), n, tolerance))
+                                  for e, p in zip(e_split, p_split)), dtype=np.int64, count=rows)
+    total_expected = total_expected.reshape(exp.shape[:-1])
+    total_hits = total_hits.reshape(exp.shape[:-1])
+    return {
+        "total_expected": total_expected,
+        "total_hits": total_hits,
+        "missed": total_expected - total_hits,
+    }
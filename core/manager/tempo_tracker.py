@@ -0,0 +1,186 @@
+# tempo_tracker.py
+# Tempo y fase del loop enganchados al reloj MIDI del dispositivo (24 PPQN).
+# - Cada 0xF8 pasa por un DLL de 2º orden (F. Adriaensen, "Using a DLL to
+#   filter time"): tiempo filtrado de cada tick + periodo estimado, sin el
+#   jitter de USB/driver
+# - 0xFA (start) pone el tiempo 0 en el siguiente tick; 0xFC (stop) congela
+#   la posición (beat/loop_phase no avanzan, los 0xF8 que sigan llegando no
+#   la mueven) y 0xFB (continue) sigue desde ahí, reenganchando en el
+#   siguiente tick
+# - Sin reloj (o si deja de llegar) la posición sigue en rueda libre con el
+#   último tempo: el juego funciona igual sin el DUO
+#
+# Todo en segundos de time.perf_counter() (los timestamps de MidiInputThread).
+#
+# PatternBank guarda los patrones en tiempos (negras) y los compila a
+# segundos para un tempo dado; la compilación se cachea por tempo.
+
+from __future__ import annotations
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+import numpy as np
+
+PPQN = 24
+DEFAULT_BPM = 64.0      # 4 tiempos = 3.75 s, el loop original del juego
+BEATS_PER_LOOP = 4
+DLL_BANDWIDTH = 0.5     # Hz: más bajo → tempo más estable, enganche más lento
+TEMPO_RESOLUTION = 0.5  # BPM: cambios menores no cuentan como cambio de tempo
+CLOCK_TIMEOUT = 0.5     # seg sin 0xF8 → se considera perdido el reloj
+COMPILE_CACHE = 8       # tempos compilados que guarda cada PatternBank
+
+CLOCK, START, CONTINUE, STOP = 0xF8, 0xFA, 0xFB, 0xFC
+
+
+class TempoTracker:
+    def __init__(self, bpm: float = DEFAULT_BPM, beats_per_loop: int = BEATS_PER_LOOP,
+                 ppqn: int = PPQN, bandwidth: float = DLL_BANDWIDTH):
+        """
+        bpm            : tempo inicial (y el de rueda libre hasta recibir reloj)
+        beats_per_loop : tiempos por loop
+        ppqn           : ticks de reloj por negra
+        bandwidth      : ancho de banda del DLL en Hz
+        """
+        self.beats_per_loop = beats_per_loop
+        self.ppqn = ppqn
+        self.bandwidth = bandwidth
+        self.running = True
+        self.ticks = 0          # 0xF8 recibidos desde el último start
+        self.version = 0        # sube cada vez que cambia `bpm`
+        self.bpm = float(bpm)
+
+        # beat(t) = _beat0 + (t - _t0) / _spb   (tramo actual, continuo entre ticks)
+        self._t0 = time.perf_counter()
+        self._beat0 = 0.0
+        self._spb = 60.0 / bpm
+        self._pending_start = False
+        self._pending_continue = False
+        self._acquiring = False
+        self._last_tick = None
+        # Estado del DLL: t1 = tiempo previsto del próximo tick, e2 = periodo de tick
+        self._t1 = None
+        self._e2 = None
+
+    # --- consultas ---
+    @property
+    def spb(self) -> float:
+        """Segundos por tiempo según el tempo estimado."""
+        return self._spb
+
+    @property
+    def loop_seconds(self) -> float:
+        return self.beats_per_loop * self._spb
+
+    def locked(self, now: Optional[float] = None) -> bool:
+        """True si llega reloj MIDI."""
+        if self._last_tick is None:
+            return False
+        return (time.perf_counter() if now is None else now) - self._last_tick < CLOCK_TIMEOUT
+
+    def beat(self, t: float) -> float:
+        if not self.running:
+            return self._beat0  # parado: posición congelada en el stop
+        return self._beat0 + (t - self._t0) / self._spb
+
+    def time_at(self, beat: float) -> float:
+        return self._t0 + (beat - self._beat0) * self._spb
+
+    def loop_index(self, t: float) -> int:
+        return math.floor(self.beat(t) / self.beats_per_loop)
+
+    def loop_start(self, t: float) -> float:
+        """Instante en que empezó el loop en curso en `t`."""
+        return self.time_at(self.loop_index(t) * self.beats_per_loop)
+
+    def loop_phase(self, t: float) -> float:
+        """Posición dentro del loop en tiempos, en [0, beats_per_loop)."""
+        return self.beat(t) % self.beats_per_loop
+
+    # --- entrada ---
+    def feed(self, t: float, status: int) -> None:
+        """Mensaje realtime (t en perf_counter)."""
+        if status == CLOCK:
+            self._tick(t)
+        elif status == START:
+            self._resume(t)
+            self._pending_start = True
+        elif status == CONTINUE:
+            if not self.running:
+                self._resume(t)
+                self._pending_continue = True
+        elif status == STOP and self.running:
+            self._beat0, self._t0 = self.beat(t), t
+            self.running = False
+
+    def _resume(self, t: float) -> None:
+        # La posición sigue desde donde se congeló, sin saltar por el tiempo parado
+        if not self.running:
+            self._t0 = t
+            self.running = True
+
+    def _tick(self, t: float) -> None:
+        tper = self._spb / self.ppqn
+        lost = self._last_tick is None or t - self._last_tick >= CLOCK_TIMEOUT
+        self._last_tick = t
+        if not self.running:
+            return  # el reloj sigue llegando parado: cuenta como enganchado, no avanza
+        if self._pending_start or self._pending_continue or lost:
+            # (Re)enganche: el periodo se mide en el siguiente tick
+            self._pending_continue = False
+            if self._pending_start:
+                self.ticks = 0
+                self._pending_start = False
+            else:
+                self.ticks = math.ceil(self.beat(t) * self.ppqn)  # seguir desde la posición actual
+            self._e2 = tper
+            self._t0, self._t1 = t, t + tper
+            self._acquiring = True
+        elif self._acquiring:
+            # Segundo tick: periodo medido directamente, el DLL parte de ahí
+            self.ticks += 1
+            self._e2 = t - self._t0
+            self._t0, self._t1 = t, t + self._e2
+            self._acquiring = False
+        else:
+            self.ticks += 1
+            omega = 2 * math.pi * self.bandwidth * self._e2
+            e = t - self._t1
+            self._t0 = self._t1
+            self._t1 += math.sqrt(2) * omega * e + self._e2
+            self._e2 += omega * omega * e
+        # Tramo lineal hasta el próximo tick previsto: beat continuo en cada tick
+        self._beat0 = self.ticks / self.ppqn
+        self._spb = (self._t1 - self._t0) * self.ppqn
+        bpm = 60.0 / (self._e2 * self.ppqn)
+        if abs(bpm - self.bpm) > TEMPO_RESOLUTION:
+            self.bpm = round(bpm / TEMPO_RESOLUTION) * TEMPO_RESOLUTION
+            self.version += 1
+
+
+class PatternBank:
+    def __init__(self, beats: Dict[int, Sequence[float]], beats_per_loop: int = BEATS_PER_LOOP):
+        """
+        beats          : {nota: [posición en tiempos dentro del loop, ...]}
+        beats_per_loop : tiempos por loop
+        """
+        self.beats = {note: sorted(float(b) for b in onsets) for note, onsets in beats.items()}
+        self.beats_per_loop = beats_per_loop
+        self._compiled: OrderedDict = OrderedDict()
+
+    def compile(self, bpm: float) -> Dict[int, np.ndarray]:
+        """{nota: onsets en segundos} para `bpm`; se reutiliza mientras no cambie el tempo."""
+        key = round(bpm / TEMPO_RESOLUTION) * TEMPO_RESOLUTION
+        out = self._compiled.get(key)
+        if out is not None:
+            self._compiled.move_to_end(key)
+            return out
+        spb = 60.0 / key
+        out = {note: np.asarray(onsets) * spb for note, onsets in self.beats.items()}
+        self._compiled[key] = out
+        if len(self._compiled) > COMPILE_CACHE:
+            self._compiled.popitem(last=False)
+        return out
+
+    def loop_seconds(self, bpm: float) -> float:
+        return self.beats_per_loop * 60.0 / bpm
@@ -0,0 +1,121 @@
+# texture_renderer.py
+# Backend de render alternativo con pygame._sdl2.video (Renderer/Texture).
+# - Cada superficie se sube una sola vez como textura; las subsurfaces del
+#   atlas comparten la textura de su página y se pintan con srcrect
+# - Si no hay GPU se usa el renderer por software de SDL
+# - Las texturas subidas con upload() quedan fijas; las demás se liberan si
+#   no se usan durante PURGE_FRAMES frames (textos, overlay del profiler...)
+# - set_scale() aplica la escala del nivel de calidad: la escena se pinta en
+#   una textura destino más pequeña que luego se amplía a la ventana (menos
+#   píxeles que rellenar); los assets no se pre-escalan, la GPU los reduce.
+#   Con el renderer por software no se aplica: copiar texturas escaladas le
+#   cuesta más que copiarlas 1:1 (bench_render: idle 4.4 → 13.6 ms a 0.75)
+#
+# El display de pygame debe existir (aunque sea oculto) para convert();
+# el Renderer necesita su propia ventana.
+
+from __future__ import annotations
+from typing import Dict, Sequence
+import pygame
+from pygame._sdl2.sdl2 import error as SDLError
+from pygame._sdl2.video import Renderer, Texture, Window
+
+PURGE_FRAMES = 120
+CLEAR_COLOR = (0, 0, 0, 255)
+
+
+class TextureRenderer:
+    def __init__(self, title: str, size, accelerated: bool = True, vsync: bool = False,
+                 window: Window | None = None):
+        """
+        title/size  : ventana propia del renderer (ignorados si se pasa `window`)
+        accelerated : intentar primero un renderer por GPU
+        vsync       : sincronizar present() con el refresco de pantalla
+        """
+        self.window = window or Window(title, size=size)
+        self.software = not accelerated
+        self.renderer = None
+        if accelerated:
+            try:
+                self.renderer = Renderer(self.window, accelerated=1, vsync=vsync)
+            except SDLError as e:
+                print(f"[Render] Sin renderer acelerado ({e}), usando software")
+                self.software = True
+        if self.renderer is None:
+            self.renderer = Renderer(self.window, accelerated=0, vsync=vsync)
+        self.renderer.draw_color = CLEAR_COLOR
+
+        self._textures: Dict[int, list] = {}  # id(superficie raíz) -> [superficie, Texture, último frame]
+        self._pinned = set()
+        self._frame = 0
+        self.size = self.window.size
+        self.scale = 1.0
+        self._target = None  # textura destino si scale < 1
+        self.frame_uploads = 0
+        self.total_uploads = 0
+
+    def _upload(self, root: pygame.Surface) -> list:
+        entry = [root, Texture.from_surface(self.renderer, root), self._frame]
+        self._textures[id(root)] = entry
+        self.frame_uploads += 1
+        self.total_uploads += 1
+        return entry
+
+    def upload(self, surfaces: Sequence[pygame.Surface]) -> None:
+        """Sube texturas por adelantado (p. ej. todos los assets al cargar)."""
+        for surf in surfaces:
+            root = surf.get_abs_parent()
+            if id(root) not in self._textures:
+                self._upload(root)
+            self._pinned.add(id(root))
+        self.frame_uploads = 0
+
+    def set_scale(self, scale: float) -> None:
+        """Resolución del render respecto a la ventana (QualityTier.scale)."""
+        if self.software or scale == self.scale:
+            return
+        self.scale = scale
+        self._target = None
+        if scale != 1.0:
+            size = (max(1, round(self.size[0] * scale)), max(1, round(self.size[1] * scale)))
+            self._target = Texture(self.renderer, size, target=True)
+
+    def draw(self, scene) -> None:
+        """Pinta una lista de (surface, pos) en el orden dado."""
+        self._frame += 1
+        self.frame_uploads = 0
+        textures = self._textures
+        frame = self._frame
+        s = self.scale
+        if self._target is not None:
+            self.renderer.target = self._target
+        self.renderer.clear()
+        for surf, pos in scene:
+            root = surf.get_abs_parent()
+            entry = textures.get(id(root))
+            if entry is None or entry[0] is not root:
+                entry = self._upload(root)
+            entry[2] = frame
+            w, h = surf.get_size()
+            dst = (pos[0], pos[1], w, h) if s == 1.0 else (
+                int(pos[0] * s), int(pos[1] * s), max(1, round(w * s)), max(1, round(h * s)))
+            if root is surf:
+                entry[1].draw(dstrect=dst)
+            else:
+                ox, oy = surf.get_abs_offset()
+                entry[1].draw(srcrect=(ox, oy, w, h), dstrect=dst)
+        if self._target is not None:
+            # Render reducido: se amplía a la ventana entera
+            self.renderer.target = None
+            self.renderer.clear()
+            self._target.draw(dstrect=(0, 0) + tuple(self.size))
+        if frame % PURGE_FRAMES == 0:
+            self._purge()
+
+    def _purge(self) -> None:
+        old = self._frame - PURGE_FRAMES
+        for key in [k for k, e in self._textures.items() if e[2] < old and k not in self._pinned]:
+            del self._textures[key]
+
+    def present(self) -> None:
+        self.renderer.present()
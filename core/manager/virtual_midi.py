@@ -0,0 +1,215 @@
+# virtual_midi.py
+# Dispositivos MIDI virtuales en el mismo proceso, para probar sin DATO DUO ni sintetizador.
+# - VirtualInput reproduce un guion de eventos con tiempos (poll/read como
+#   pygame.midi.Input, con timestamps de PortTime y el filtro de PortMidi)
+# - VirtualOutput acepta lo mismo que pygame.midi.Output (note_on/note_off/
+#   write_short/write/set_instrument/close) y registra cada mensaje con el
+#   instante en que se envió y el instante en que sonaría (latency + timestamp)
+# - Con latency > 0, PortMidi exige timestamps no decrecientes en cada stream
+#   (write_short usa "ahora"): VirtualOutput lanza AssertionError si no lo son
+# - Varios VirtualOutput pueden compartir `messages`, como dos puertos
+#   abiertos sobre el mismo sintetizador
+# - hit_latencies() mide golpe → nota entre ambos
+#
+# Formato del guion (texto; '#' inicia un comentario):
+#   0.500  0xB9 81 100         t(seg)  status data1 data2  (decimal o 0x..)
+#   clock  120  0.0  8.0       reloj 24 PPQN a 120 BPM de 0 s a 8 s (con 0xFA al inicio)
+#   end    10.0                duración del guion (por defecto último evento + 1 s)
+# También se cargan grabaciones .ubev/.pkl (sandbox/midi/midi_rec.py) y .mid.
+#
+# Los tiempos del guion cuentan desde el primer poll().
+
+from __future__ import annotations
+import json
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pygame.midi
+import pygame.pypm as pypm
+from manager.event_file import load_any
+from manager.midi_input import MidiClock
+
+TAIL = 1.0  # seg de guion tras el último evento si no hay `end`
+
+ScriptEvent = Tuple[float, List[int]]  # (t seg, [status, data1, data2])
+
+# Bits de Pm_SetFilter → status que descartan
+_FILTER_STATUS = (
+    (pypm.FILT_ACTIVE, {0xFE}),
+    (pypm.FILT_SYSEX, {0xF0, 0xF7}),
+    (pypm.FILT_CLOCK, {0xF8}),
+    (pypm.FILT_PLAY, {0xFA, 0xFB, 0xFC}),
+    (pypm.FILT_TICK, {0xF9}),
+    (pypm.FILT_FD, {0xFD}),
+    (pypm.FILT_RESET, {0xFF}),
+)
+
+
+def load_events(path) -> Tuple[List[ScriptEvent], Optional[float]]:
+    """Lee un guion de texto o una grabación (.ubev/.pkl/.mid). Devuelve (eventos, duración o None)."""
+    path = Path(path)
+    if path.suffix.lower() in (".ubev", ".pkl", ".mid", ".midi"):
+        times, msgs = load_any(path)
+        return list(zip(times.tolist(), msgs.tolist())), None
+
+    events, duration = [], None
+    for line in path.read_text().splitlines():
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        if fields[0] == "end":
+            duration = float(fields[1])
+        elif fields[0] == "clock":
+            bpm, t0, t1 = map(float, fields[1:4])
+            tick = 60.0 / bpm / 24
+            events.append((t0, [0xFA, 0, 0]))
+            events.extend((float(t), [0xF8, 0, 0]) for t in np.arange(t0, t1, tick))
+        else:
+            data = [int(x, 0) for x in fields[1:4]]
+            events.append((float(fields[0]), data + [0] * (3 - len(data))))
+    return events, duration
+
+
+class VirtualInput:
+    def __init__(self, events: Sequence[ScriptEvent], duration: Optional[float] = None):
+        """
+        events   : [(t seg desde el primer poll, [status, data1, data2])]
+        duration : seg hasta que `finished` es True (por defecto último evento + TAIL)
+        """
+        self.events = sorted(events, key=lambda e: e[0])
+        last = self.events[-1][0] if self.events else 0.0
+        self.duration = last + TAIL if duration is None else duration
+        self.start_time = None   # perf_counter del primer poll()
+        self._base_ms = 0        # pygame.midi.time() en ese momento
+        self._pos = 0
+        self._blocked = set()
+        self.closed = False
+
+    @classmethod
+    def from_file(cls, path) -> "VirtualInput":
+        events, duration = load_events(path)
+        return cls(events, duration)
+
+    def _elapsed(self) -> float:
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+            self._base_ms = pygame.midi.time()
+        return time.perf_counter() - self.start_time
+
+    def set_filter(self, filters: int) -> None:
+        """Equivalente a Pm_SetFilter (ver midi_input.set_source_filter)."""
+        self._blocked = set().union(*(st for bit, st in _FILTER_STATUS if filters & bit))
+
+    def poll(self) -> bool:
+        elapsed = self._elapsed()
+        while self._pos < len(self.events) and self.events[self._pos][1][0] in self._blocked:
+            self._pos += 1
+        return self._pos < len(self.events) and self.events[self._pos][0] <= elapsed
+
+    def read(self, num_events: int) -> list:
+        elapsed = self._elapsed()
+        out = []
+        while self._pos < len(self.events) and len(out) < num_events:
+            t, msg = self.events[self._pos]
+            if t > elapsed:
+                break
+            self._pos += 1
+            if msg[0] not in self._blocked:
+                out.append([[msg[0], msg[1], msg[2], 0], self._base_ms + int(round(t * 1000))])
+        return out
+
+    @property
+    def finished(self) -> bool:
+        return self.start_time is not None and self._elapsed() >= self.duration
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class VirtualOutput:
+    def __init__(self, latency: int = 0, clock: Optional[MidiClock] = None,
+                 messages: Optional[list] = None):
+        """
+        latency  : ms, como pygame.midi.Output (0 → los timestamps de write() se ignoran)
+        clock    : traducción PortTime → perf_counter (por defecto una propia)
+        messages : registro compartido con otro VirtualOutput (mismo dispositivo)
+        """
+        self.latency = latency
+        self.clock = clock or MidiClock()
+        # (suena en, enviado en, status, data1, data2), tiempos en perf_counter
+        self.messages: List[Tuple[float, float, int, int, int]] = [] if messages is None else messages
+        self._last_ts = None  # último timestamp del stream (ms de PortTime)
+        self.closed = False
+
+    def _check_order(self, ts: int) -> None:
+        if not self.latency:
+            return
+        if self._last_ts is not None and ts < self._last_ts:
+            raise AssertionError(f"timestamp {ts} ms anterior al último del stream ({self._last_ts} ms)")
+        self._last_ts = ts
+
+    def _record(self, due: float, msg) -> None:
+        msg = list(msg) + [0] * (3 - len(msg))
+        self.messages.append((due, time.perf_counter(), msg[0], msg[1], msg[2]))
+
+    def write_short(self, status: int, data1: int = 0, data2: int = 0) -> None:
+        self._check_order(self.clock.to_midi(time.perf_counter()))
+        self._record(time.perf_counter() + self.latency / 1000, (status, data1, data2))
+
+    def write(self, data) -> None:
+        """[[[status, data1, data2], timestamp_ms], ...] como pygame.midi.Output.write."""
+        for msg, ts in data:
+            self._check_order(ts)
+            if self.latency:
+                due = max(self.clock.to_game(ts + self.latency), time.perf_counter())
+            else:
+                due = time.perf_counter()
+            self._record(due, msg[:3])
+
+    def note_on(self, note: int, velocity: int, channel: int = 0) -> None:
+        self.write_short(0x90 | channel, note, velocity)
+
+    def note_off(self, note: int, velocity: int = 0, channel: int = 0) -> None:
+        self.write_short(0x80 | channel, note, velocity)
+
+    def set_instrument(self, instrument_id: int, channel: int = 0) -> None:
+        self.write_short(0xC0 | channel, instrument_id)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def note_ons(self) -> List[Tuple[float, float, int, int, int]]:
+        """Mensajes note_on con velocidad > 0, en orden de envío."""
+        return [m for m in self.messages if m[2] & 0xF0 == 0x90 and m[4] > 0]
+
+    def dump(self, path, origin: float = 0.0) -> None:
+        """Escribe los mensajes en JSON, con tiempos relativos a `origin` (perf_counter)."""
+        data = [{"t": round(due - origin, 6), "sent": round(sent - origin, 6), "msg": [s, d1, d2]}
+                for due, sent, s, d1, d2 in self.messages]
+        with open(path, "w") as f:
+            json.dump({"latency_ms": self.latency, "messages": data}, f, indent=1)
+
+
+def _is_crush(status: int, data1: int, data2: int) -> bool:
+    return (status & 0xF0) == 0xB0 and data1 == 81 and data2 >= 64
+
+
+def hit_latencies(inp: VirtualInput, out: VirtualOutput, is_hit=_is_crush) -> np.ndarray:
+    """
+    Segundos entre cada golpe del guion (is_hit) y el sonido del primer note_on
+    enviado después (la respuesta al golpe; lo que el secuenciador ya tenía
+    enviado de antes no cuenta). Golpes sin respuesta → NaN.
+    """
+    if inp.start_time is None:
+        return np.empty(0)
+    hits = np.array([inp.start_time + t for t, m in inp.events[:inp._pos] if is_hit(*m[:3])])
+    notes = out.note_ons()
+    sent = np.array([n[1] for n in notes])
+    due = np.array([n[0] for n in notes])
+    lat = np.full(len(hits), np.nan)
+    if len(notes):
+        idx = np.searchsorted(sent, hits)
+        ok = idx < len(notes)
+        lat[ok] = due[idx[ok]] - hits[ok]
+    return lat
@@ -0,0 +1,5 @@
+# Los módulos se importan como en el juego (`from manager.x import ...`, con core/ como directorio del script)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,37 @@
+import time
+
+from manager.midi_manager import MIDIManager
+from manager.tempo_tracker import TempoTracker
+
+
+class _Output:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.extend(data)
+
+
+def test_reset_right_after_a_note_does_not_resend_it(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "perf_counter", lambda: now[0])
+    tempo = TempoTracker(bpm=240)  # loop de 4 tiempos = 1 s, empieza en t=100
+    out = _Output()
+    manager = MIDIManager([True], {47: [2.0]}, out, tempo=tempo)  # nota en t=100.5
+
+    manager.reset()
+    manager.update()
+    assert out.writes == []
+
+    now[0] = 100.5
+    manager.update()  # se envía y suena (_fire la quita de _pending)
+    assert len(out.writes) == 1
+
+    now[0] = 100.53  # reset dentro de DEDUP_WINDOW
+    manager.reset()
+    manager.update()
+    assert len(out.writes) == 1
+
+    now[0] = 101.5  # la del loop siguiente sí se envía
+    manager.update()
+    assert len(out.writes) == 2
@@ -0,0 +1,31 @@
+from manager.rhythm_manager import RhythmManager
+
+
+def _manager():
+    return RhythmManager([[1, 0, 0, 0, 1, 0, 0, 0]], 8, tolerance_steps=1)
+
+
+def test_loops_recorded_only_counts_loops_with_hits():
+    rm = _manager()
+    rm.register_prediction(0, 0, 0)
+    rm.register_prediction(0, 0, 5)
+    rm.evaluate_loop_for_cloud(0)
+    rm.evaluate_loop_for_cloud(1)  # evaluado sin ningún golpe
+
+    status = rm.cloud_status(0)
+    assert status["loops_recorded"] == [0]
+    assert status["hits_by_loop"] == {0: [0, 4], 1: []}
+    assert list(rm.progress[0].predictions_by_loop) == [0]
+    assert rm.evaluate_all()["loop"].tolist() == [0]
+
+
+def test_loops_recorded_follows_the_history_ring():
+    rm = RhythmManager([[1, 0, 0, 0]], 4, history=4)
+    for loop in range(10):
+        rm.register_prediction(loop, 0, 0)
+        rm.evaluate_loop_for_cloud(loop)
+    rm.evaluate_loop_for_cloud(10)
+    status = rm.cloud_status(0)
+    # loop 10 (sin golpes) ocupa la ranura del 6
+    assert status["loops_recorded"] == [7, 8, 9]
+    assert sorted(status["hits_by_loop"]) == [7, 8, 9, 10]
@@ -1,5 +1,9 @@
+import sys
+from pathlib import Path
 import pygame.midi
-import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "core"))
+from manager.playback_scheduler import PlaybackScheduler
 
 # Configuración MIDI
 pygame.midi.init()
@@ -47,25 +51,13 @@ pattern.sort(key=lambda x: x[0])
 
 print("\n🎶 Iniciando loop de cumbia (Ctrl+C para salir)\n")
 
+player = PlaybackScheduler(midi_out).start()
 try:
-    while True:
-        loop_start = time.time()
-        idx = 0
-        while True:
-            now = time.time() - loop_start
-            if idx < len(pattern) and now >= pattern[idx][0]:
-                _, note = pattern[idx]
-                midi_out.note_on(note, VEL, CHANNEL)
-                time.sleep(0.05)
-                midi_out.note_off(note, 0, CHANNEL)
-                idx += 1
-            elif now >= LOOP_DURATION:
-                break
-            else:
-                time.sleep(0.001)
-        print("Loop!")
+    player.loop(pattern, LOOP_DURATION, VEL, CHANNEL, on_loop=lambda k: print("Loop!"))
 except KeyboardInterrupt:
     print("\n🛑 Loop detenido por el usuario.")
 finally:
+    player.flush()
+    print(f"Retraso: {player.stats.report()}")
     midi_out.close()
     pygame.midi.quit()
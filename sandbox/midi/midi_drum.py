@@ -1,5 +1,11 @@
-import pygame.midi
+import sys
 import time
+from pathlib import Path
+import pygame.midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "core"))
+from manager.playback_scheduler import PlaybackScheduler
+from manager.quantize import quantize_matrix
 
 # --- utilidades ---
 def map_value(value, in_min, in_max, out_min, out_max):
@@ -36,6 +42,7 @@ recording = True
 loop_length = 8.0
 start_time = None
 active_instrument = None  # instrumento activo actual
+player = None             # PlaybackScheduler de la reproducción
 
 print("\n🎛️ Grabación activa (hasta que pulses CC65).")
 print("CC71 → cambia instrumento (reinicia contador y sobrescribe si ya existía).")
@@ -87,6 +94,11 @@ try:
             print("\n🎶 Matriz final:")
             for inst, hits in matrix.items():
                 print(f"  Nota {inst}: {['%.2f' % h for h in hits]}")
+
+            # Versión limpia (rejilla de 16 pasos), lista para pegar en core/main.py
+            print("\n📐 Matriz cuantizada:")
+            for inst, hits in quantize_matrix(matrix, loop_length, 16).items():
+                print(f"  {inst}: {hits},")
             
             # === Construir línea de tiempo consolidada ===
             timeline = []
@@ -102,25 +114,14 @@ try:
             print("\n🔁 Iniciando loop de reproducción (Ctrl+C para salir)\n")
 
             # --- loop infinito de reproducción ---
-            while True:
-                loop_start = time.time()
-                idx = 0
-                while True:
-                    now = time.time() - loop_start
-                    if idx < len(timeline) and now >= timeline[idx][0]:
-                        _, inst = timeline[idx]
-                        midi_out.note_on(inst, 120, CHANNEL_DRUMS)
-                        time.sleep(0.05)
-                        midi_out.note_off(inst, 0, CHANNEL_DRUMS)
-                        idx += 1
-                    elif now >= loop_length:
-                        break
-                    else:
-                        time.sleep(0.001)
-                print("Loop!")
+            player = PlaybackScheduler(midi_out).start()
+            player.loop(timeline, loop_length, 120, CHANNEL_DRUMS, on_loop=lambda k: print("Loop!"))
 except KeyboardInterrupt:
     print("\n🛑 Programa detenido por el usuario.")
 finally:
+    if player is not None:
+        player.flush()
+        print(f"Retraso: {player.stats.report()}")
     del midi_in
     midi_out.close()
     pygame.midi.quit()
@@ -1,27 +1,33 @@
-import pygame.midi, time, pickle
+import sys
+from pathlib import Path
+import pygame.midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "core"))
+from manager.event_file import EventFile
+from manager.playback_scheduler import PlaybackScheduler
 
 pygame.midi.init()
 output_id = 2  # Puerto de salida (puede ser “Microsoft GS Wavetable” o el Dato DUO)
 midi_out = pygame.midi.Output(output_id)
 
-# Cargar el loop
-with open("dato_duo_loop.pkl", "rb") as f:
-    events = pickle.load(f)
-
-loop_length = events[-1][0]  # duración total en segundos
+# Cargar el loop (memmap: no se lee entero, se recorre por trozos)
+loop = EventFile("dato_duo_loop.ubev")
+loop_length = loop.duration  # duración total en segundos
 
-print(f"Reproduciendo loop de {loop_length:.2f}s... Ctrl+C para parar.")
+print(f"Reproduciendo loop de {loop_length:.2f}s ({len(loop)} eventos)... Ctrl+C para parar.")
 
+player = PlaybackScheduler(midi_out).start()
+loops = 0
 try:
-    while True:  # loop infinito
-        start = time.time()
-        for t, data in events:
-            while (time.time() - start) < t:
-                time.sleep(0.001)
-            midi_out.write_short(*data)
+    while True:  # loop infinito; cada vuelta empieza en loops * loop_length exactos
+        for times, msgs in loop.chunks():
+            player.play(zip(times.tolist(), msgs.tolist()), offset=loops * loop_length)
+        loops += 1
         print("Loop!")
 except KeyboardInterrupt:
     print("\nLoop detenido.")
 finally:
+    player.flush()
+    print(f"Retraso: {player.stats.report()}")
     midi_out.close()
     pygame.midi.quit()
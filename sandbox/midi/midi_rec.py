@@ -1,5 +1,16 @@
-import pygame.midi
+import sys
 import time
+from pathlib import Path
+import pygame.midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "core"))
+from manager.midi_input import REALTIME_FILTER, set_source_filter
+from manager.recorder import StreamingRecorder
+
+# Se graba directamente a disco: si el script muere, lo capturado sigue ahí
+# (python core/manager/event_file.py recover dato_duo_loop.ubev)
+OUTPUT_FILE = "dato_duo_loop.ubev"
+READ_CHUNK = 64
 
 pygame.midi.init()
 input_id = 1   # ID del Dato DUO
@@ -9,7 +20,11 @@ output_id = 2  # Por si luego quieres devolverlo al DUO
 
 midi_in = pygame.midi.Input(input_id)
 midi_out = pygame.midi.Output(output_id)
-events = []
+# Clock, start/stop, active sensing: fuera ya en PortMidi (el DUO manda 0xF8 sin parar);
+# lo que se cuele lo descarta el grabador
+set_source_filter(midi_in, REALTIME_FILTER)
+recorder = StreamingRecorder(OUTPUT_FILE).start()
+seen = max_backlog = 0
 start_time = time.time()
 guia_start_time = time.time()
 
@@ -26,28 +41,32 @@ try:
             guia_start_time = time.time()
             print("=========================================")
         if midi_in.poll():
-            for data, ts in midi_in.read(10):
-                status, d1, d2, _ = data
-                rel_time = time.time() - start_time
-
-                events.append((rel_time, [status, d1, d2]))
-                if data[0]!=248:
+            # Vaciar el buffer entero: con el clock del DUO, read(10) deja golpes esperando
+            backlog = 0
+            while midi_in.poll():
+                for data, ts in midi_in.read(READ_CHUNK):
+                    status, d1, d2, _ = data
+                    seen += 1
+                    rel_time = time.time() - start_time
+                    if not recorder.record(rel_time, status, d1, d2):
+                        continue
+                    backlog += 1
                     #if data[2] == 127:
                     #    midi_out.note_on(35, 110, 9)
                     #    time.sleep(0.05)
                     #    midi_out.note_off(35, 0, 0)
                     print(f"[{rel_time:.3f}s] {data}")
+            max_backlog = max(max_backlog, backlog)
         else:
             time.sleep(0.005)
 except KeyboardInterrupt:
     print("\nGrabación detenida.")
 finally:
+    recorder.close()
     del midi_in
     pygame.midi.quit()
 
-# Guarda los eventos
-import pickle
-with open("dato_duo_loop.pkl", "wb") as f:
-    pickle.dump(events, f)
-
-print(f"{len(events)} eventos guardados.")
+stats = recorder.stats
+print(f"{stats.written} eventos guardados en {OUTPUT_FILE} "
+      f"(vistos {seen}, realtime descartados {stats.filtered}, perdidos {stats.overflow}, "
+      f"máx. por lectura {max_backlog}).")